@@ -0,0 +1,39 @@
+# the factored and corner-point action modes of BppEnv against the flat valid moves
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+
+def flat_valid_items(env):
+    # items with some valid move, from the full mask of the state
+    valids = env.game.get_valid_moves(env.board, env.items)
+    return valids.reshape(env.num_items, -1).any(axis=1).astype(int)
+
+@pytest.mark.parametrize('size, num_items', [(15, 10), (20, 30)])
+def test_factored_item_mask(size, num_items):
+    env = BppEnv(size*2//3, size*2//3, num_items, size, size, action_mode='factored', obs_mode='compact')
+    rng = np.random.default_rng(0)
+    for seed in range(10):
+        env.reset(seed=seed)
+        done = False
+        while not done:
+            np.testing.assert_array_equal(env.valids, flat_valid_items(env))
+            item = int(rng.choice(np.flatnonzero(env.valids)))
+            position = int(rng.choice(np.flatnonzero(env.get_position_mask(item))))
+            _, _, done, info = env.step([item, position])
+        assert not flat_valid_items(env).any() or env.current_step > env.max_step
+
+@pytest.mark.parametrize('num_corners', [1, 4, 16])
+def test_corners_end_as_flat(num_corners):
+    # the corners mode ends an episode only when no item has a valid move at all
+    env = BppEnv(action_mode='corners', num_corners=num_corners, obs_mode='compact')
+    rng = np.random.default_rng(num_corners)
+    for seed in range(40):
+        env.reset(seed=seed)
+        done = False
+        while not done:
+            assert env.valids.any()
+            action = int(rng.choice(np.flatnonzero(env.valids)))
+            _, reward, done, _ = env.step(action)
+        if env.current_step <= env.max_step:
+            assert not flat_valid_items(env).any()
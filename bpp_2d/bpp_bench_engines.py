@@ -0,0 +1,57 @@
+# micro-benchmark of the placement engines: array bin (summed-area table) vs bitboard
+# usage: python bpp_bench_engines.py [--repeat 20]
+import argparse
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append('./gym-2d')
+from gym_bpp_2d.envs.BinPackingGame import BinPackingGame, ItemsGenerator
+from gym_bpp_2d.envs.BinPackingLogic import Bin, BitBin
+
+def half_packed_board(size, num_items, seed):
+    # play random valid moves until about half of the items are placed
+    game = BinPackingGame(size, size, num_items, n=1)
+    items = game.getInitItems(ItemsGenerator(size*2//3, size*2//3, num_items).items_generator(seed))
+    board = game.getInitBoard()
+    rng = np.random.RandomState(seed)
+    for _ in range(num_items // 2):
+        valids = game.get_valid_moves(board, items)
+        if not valids.any():
+            break
+        board, items = game.getNextState(board, rng.choice(np.flatnonzero(valids)), items)
+    return board, items
+
+def masks(b, board, items):
+    # all placement masks of the remaining items on a fresh bin
+    b.pieces = board
+    for w, h, placed in items:
+        if not placed:
+            b.get_placement_mask(int(w), int(h))
+
+def placements(b, board, moves):
+    b.pieces = board
+    for move, w, h in moves:
+        b.execute_move(move, w, h)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print('{:>6} {:>10} {:>14} {:>14} {:>8}'.format('bin', 'engine', 'masks (ms)', 'place (us)', 'speedup'))
+    for size in (10, 32, 64):
+        num_items = max(5, size // 2)
+        board, items = half_packed_board(size, num_items, seed=0)
+        # a few 1x1 placements on free cells
+        moves = [((i, j), 1, 1) for i, j in np.argwhere(board == 0)[:8]]
+        results = {}
+        for name, new_bin in (('array', lambda: Bin(size, size)), ('bitboard', lambda: BitBin(size, size))):
+            t_mask = min(timeit.repeat(lambda: masks(new_bin(), board, items), number=1, repeat=args.repeat))
+            t_place = min(timeit.repeat(lambda: placements(new_bin(), board, moves), number=1, repeat=args.repeat))
+            results[name] = (t_mask, t_place / len(moves))
+        for name, (t_mask, t_place) in results.items():
+            speedup = results['array'][0] / t_mask
+            print('{:>6} {:>10} {:>14.3f} {:>14.1f} {:>8.2f}'.format(
+                '{0}x{0}'.format(size), name, t_mask*1e3, t_place*1e6, speedup))
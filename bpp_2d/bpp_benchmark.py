@@ -0,0 +1,144 @@
+# performance benchmark of the 2d bpp env over a grid of bin sizes x item counts
+# usage:
+#   python bpp_benchmark.py --out results.json
+#   python bpp_benchmark.py --out results.json --compare baseline.json --threshold 10
+# with --compare, exits with status 1 if a metric is worse than the baseline by more than threshold %
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append('./gym-2d')
+from gym_bpp_2d.envs import BppEnv
+
+BIN_SIZES = (10, 16, 32, 64)
+NUM_ITEMS = (5, 10, 20, 50)
+# metric -> True if higher is better
+METRICS = {
+    'env_steps_per_sec': True,
+    'valid_moves_ms': False,
+    'next_state_ms': False,
+    'reset_ms': False,
+    'symmetries_per_sec': True,
+    'peak_memory_kb': False,
+}
+
+def make_env(size, num_items, seed=0):
+    # items are sliced from a bin of 2/3 of the virtual bin, as the default 10 vs 15
+    item_bin = max(2, size * 2 // 3)
+    return BppEnv(item_bin, item_bin, num_items, size, size, seed=seed)
+
+def feasible(size, num_items):
+    item_bin = max(2, size * 2 // 3)
+    return num_items <= item_bin * item_bin
+
+def random_play(env, rng, num_steps):
+    # random valid actions; returns the visited (bin, items) states
+    env.reset()
+    states = []
+    for _ in range(num_steps):
+        states.append((env.board, env.items))
+        _, _, done, _ = env.step(rng.choice(np.flatnonzero(env.valids)))
+        if done:
+            env.reset()
+    return states
+
+def timed(fn, repeat):
+    # median seconds per call (robust to scheduling noise)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def bench_config(size, num_items, num_steps):
+    rng = np.random.RandomState(0)
+    result = {}
+
+    tracemalloc.start()
+    env = make_env(size, num_items)
+    random_play(env, rng, min(num_steps, 20))
+    result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    states = random_play(env, rng, num_steps)
+    result['env_steps_per_sec'] = num_steps / (time.perf_counter() - start)
+
+    game = env.game
+    states = iter(states * 2)
+    result['valid_moves_ms'] = timed(lambda: game.get_valid_moves(*next(states)), num_steps) * 1e3
+
+    moves = []
+    for board, items in random_play(env, rng, num_steps):
+        valids = game.get_valid_moves(board, items)
+        if valids.any():
+            moves.append((board, rng.choice(np.flatnonzero(valids)), items))
+    moves = iter(moves * 2)
+    result['next_state_ms'] = timed(lambda: game.getNextState(*next(moves)), num_steps // 2) * 1e3
+
+    result['reset_ms'] = timed(env.reset, max(num_steps // 10, 5)) * 1e3
+
+    state = game.getBinItem(env.board, env.items)
+    pi = rng.random_sample(game.getActionSize())
+    pi /= pi.sum()
+    result['symmetries_per_sec'] = 1 / timed(lambda: game.getSymmetries(state, pi), max(num_steps // 20, 3))
+    return result
+
+def run(sizes, item_counts, num_steps):
+    results = {}
+    for size in sizes:
+        for num_items in item_counts:
+            if not feasible(size, num_items):
+                continue
+            key = 'bin{}_items{}'.format(size, num_items)
+            results[key] = bench_config(size, num_items, num_steps)
+            print(key, ' '.join('{}={:.3f}'.format(k, v) for k, v in results[key].items()))
+    return results
+
+def compare(results, baseline, threshold):
+    # list of regressions beyond threshold % against the baseline results
+    regressions = []
+    for key, metrics in results.items():
+        if key not in baseline:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            new, old = metrics.get(metric), baseline[key].get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append('{} {}: {:.3f} -> {:.3f} ({:+.1f}%)'.format(key, metric, old, new, change))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', default='bench_results.json', help='where to write the results (JSON)')
+    parser.add_argument('--compare', default=None, help='baseline results (JSON) to compare against')
+    parser.add_argument('--threshold', type=float, default=10, help='allowed regression in percent')
+    parser.add_argument('--steps', type=int, default=200, help='env steps per configuration')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BIN_SIZES)
+    parser.add_argument('--items', type=int, nargs='+', default=NUM_ITEMS)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.items, args.steps)
+    with open(args.out, 'w') as f:
+        json.dump({'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'machine': platform.machine(), 'steps': args.steps},
+                   'results': results}, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+        print('no regression beyond {}%'.format(args.threshold))
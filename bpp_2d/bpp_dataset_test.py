@@ -0,0 +1,63 @@
+# TrajectoryRecorder/TrajectoryReader: the replayed transitions are the ones the env returned
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+from gym_bpp_2d.envs.bpp_dataset import TrajectoryReader, TrajectoryRecorder
+
+def copy_obs(obs):
+    return {key: a.copy() for key, a in obs.items()} if isinstance(obs, dict) else obs.copy()
+
+def assert_same(a, b):
+    if isinstance(a, dict):
+        for key in a:
+            np.testing.assert_array_equal(a[key], b[key], err_msg=key)
+    else:
+        np.testing.assert_array_equal(a, b)
+
+@pytest.mark.parametrize('obs_mode', ['dense', 'compact', 'heightmap', 'packed'])
+def test_record_replay(tmp_path, obs_mode):
+    path = str(tmp_path / 'dataset')
+    env = TrajectoryRecorder(BppEnv(obs_mode=obs_mode), path, chunk_size=25)
+    rng = np.random.default_rng(0)
+    transitions = []
+    for episode in range(12):
+        # positional seeds reach the env
+        obs = copy_obs(env.reset(None, episode))
+        done = False
+        while not done:
+            valid = np.flatnonzero(env.valids)
+            # some invalid actions, recorded as -1
+            action = int(rng.integers(env.action_space.n)) if rng.random() < 0.2 else int(rng.choice(valid))
+            next_obs, reward, done, _ = env.step(action)
+            next_obs = copy_obs(next_obs)
+            transitions.append((obs, action if action in valid else -1, reward, next_obs, done))
+            obs = next_obs
+    env.close()
+
+    reader = TrajectoryReader(path, obs_mode=obs_mode)
+    assert reader.num_chunks > 1
+    assert len(reader) == len(transitions)
+    for (obs, action, reward, next_obs, done), expected in zip(reader, transitions):
+        assert_same(obs, expected[0])
+        assert action == expected[1]
+        assert reward == pytest.approx(expected[2], rel=1e-6)
+        assert_same(next_obs, expected[3])
+        assert done == expected[4]
+    # every chunk holds the instances of its own episodes only, indexed from 0
+    for c in range(reader.num_chunks):
+        steps, items = reader.load_chunk(c)
+        np.testing.assert_array_equal(np.unique(steps['episode']), np.arange(len(items)))
+
+def test_replay_shuffled_chunks(tmp_path):
+    path = str(tmp_path / 'dataset')
+    env = TrajectoryRecorder(BppEnv(), path, chunk_size=10)
+    for episode in range(6):
+        env.reset(seed=episode)
+        done = False
+        while not done:
+            _, _, done, _ = env.step(int(np.flatnonzero(env.valids)[0]))
+    env.close()
+    ordered = [(a, r, d) for _, a, r, _, d in TrajectoryReader(path)]
+    shuffled = [(a, r, d) for _, a, r, _, d in TrajectoryReader(path, shuffle=True, seed=1)]
+    assert sorted(shuffled) == sorted(ordered)
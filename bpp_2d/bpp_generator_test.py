@@ -0,0 +1,49 @@
+# ItemsGenerator instances and the InstanceStore of pre-generated instances
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+from gym_bpp_2d.envs.BinPackingGame import InstanceStore, ItemsGenerator
+
+@pytest.mark.parametrize('W, H, N', [(10, 10, 10), (7, 4, 28), (15, 3, 1), (20, 20, 50)])
+def test_instances_tile_the_bin(W, H, N):
+    # the items of an instance slice the bin: every cell is covered exactly once
+    instances = ItemsGenerator(W, H, N).generate(50, seed=W*100 + N)
+    assert instances.shape == (50, N, 4)
+    for items in instances:
+        cover = np.zeros((H, W), dtype=int)
+        for w, h, x, y in items:
+            assert w >= 1 and h >= 1
+            cover[y:y+h, x:x+w] += 1
+        np.testing.assert_array_equal(cover, 1)
+
+def test_generate_deterministic():
+    gen = ItemsGenerator(10, 10, 10)
+    np.testing.assert_array_equal(gen.generate(20, 3), gen.generate(20, 3))
+    assert not np.array_equal(gen.generate(20, 3), gen.generate(20, 4))
+    assert gen.items_generator([1, 2]) == gen.items_generator([1, 2])
+
+def test_instance_store_chunks(tmp_path):
+    # instances generated chunk by chunk are read back unchanged
+    gen = ItemsGenerator(10, 10, 10)
+    path = str(tmp_path / 'instances.npy')
+    store = InstanceStore.create(path, gen, 10, seed=5, chunk_size=3)
+    assert len(store) == 10
+    again = InstanceStore(path)
+    for i in range(10):
+        assert store[i] == again[i]
+        assert len(store[i]) == 10
+    # same seed and chunk size, same instances
+    other = InstanceStore.create(str(tmp_path / 'other.npy'), gen, 10, seed=5, chunk_size=3)
+    np.testing.assert_array_equal(store.instances, other.instances)
+
+def test_env_plays_store_instances(tmp_path):
+    path = str(tmp_path / 'instances.npy')
+    store = InstanceStore.create(path, ItemsGenerator(10, 10, 10), 4, seed=0)
+    env = BppEnv(instance_store=path, obs_mode='compact')
+    # reset(i) plays instance i, a bare reset() the next one
+    for index, expected in [(2, 2), (None, 3), (None, 0), (1, 1), (None, 2)]:
+        obs = env.reset(index)
+        assert env.items_list == store[expected]
+        np.testing.assert_array_equal(obs['items'][:, :2], np.array(store[expected])[:, :2])
+        assert not obs['items'][:, 2].any()
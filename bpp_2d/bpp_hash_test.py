@@ -0,0 +1,34 @@
+# Zobrist hashing and the transposition table of BinPackingGame
+import numpy as np
+
+from gym_bpp_2d.envs.BinPackingGame import BinPackingGame, ItemsGenerator
+
+def get_items(game, seed):
+    return game.getInitItems(ItemsGenerator(10, 10, game.num_items).items_generator(seed))
+
+def test_incremental_hash_matches_full_hash():
+    game = BinPackingGame(15, 15, 10, n=1)
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        board, items = game.getInitBoard(), get_items(game, seed)
+        key = game.stringRepresentation(board, items)
+        while True:
+            valids = game.get_valid_moves(board, items)
+            if not valids.any():
+                break
+            board, items, key = game.getNextState(board, int(rng.choice(np.flatnonzero(valids))), items, key)
+            assert key == game.stringRepresentation(board, items)
+
+def test_hash_depends_on_instance():
+    # same bin and placed items, items of two instances: different unplaced items, different valid moves
+    game = BinPackingGame(15, 15, 10, n=1, table_bytes=2**20)
+    board = np.ones((15, 15), dtype=int)
+    board[13:, 13:] = 0
+    a, b = get_items(game, 0), get_items(game, 1)
+    a[:5, 2] = b[:5, 2] = 1
+    assert not np.array_equal(game.get_valid_moves(board, a), game.get_valid_moves(board, b))
+    assert game.stringRepresentation(board, a) != game.stringRepresentation(board, b)
+    for items in (a, b, a):
+        valids, ended, reward = game.evaluate(board, items)
+        np.testing.assert_array_equal(valids, game.get_valid_moves(board, items))
+    assert game.table.hits == 1
@@ -0,0 +1,65 @@
+# the inplace mode of BppEnv: same transitions as the default mode, read-only views or copies
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+
+def random_action(env, rng):
+    if env.action_mode == 'factored':
+        item = int(rng.choice(np.flatnonzero(env.valids)))
+        return [item, int(rng.choice(np.flatnonzero(env.get_position_mask(item))))]
+    if rng.random() < 0.1:
+        # invalid actions leave the state unchanged
+        return int(rng.integers(env.action_space.n))
+    return int(rng.choice(np.flatnonzero(env.valids)))
+
+def arrays(obs):
+    return list(obs.values()) if isinstance(obs, dict) else [obs]
+
+def assert_same(a, b):
+    for x, y in zip(arrays(a), arrays(b)):
+        np.testing.assert_array_equal(x, y)
+
+@pytest.mark.parametrize('reward_mode', ['terminal', 'bbox', 'density'])
+@pytest.mark.parametrize('action_mode', ['flat', 'factored', 'corners'])
+@pytest.mark.parametrize('obs_mode', ['dense', 'compact', 'heightmap', 'packed'])
+def test_inplace_same_as_default(obs_mode, action_mode, reward_mode):
+    kwargs = dict(obs_mode=obs_mode, action_mode=action_mode, reward_mode=reward_mode, num_corners=4)
+    env, ref = BppEnv(inplace=True, **kwargs), BppEnv(**kwargs)
+    rng = np.random.default_rng(0)
+    for seed in range(3):
+        obs, ref_obs = env.reset(seed=seed), ref.reset(seed=seed)
+        assert_same(obs, ref_obs)
+        assert_same(env.get_info(), ref.get_info())
+        done = False
+        while not done:
+            action = random_action(ref, rng)
+            obs, reward, done, info = env.step(action)
+            ref_obs, ref_reward, ref_done, ref_info = ref.step(action)
+            assert_same(obs, ref_obs)
+            assert_same(info, ref_info)
+            assert info.keys() == ref_info.keys()
+            assert reward == pytest.approx(ref_reward)
+            assert done == ref_done
+            for a in arrays(obs):
+                assert not a.flags.writeable
+            if action_mode == 'flat':
+                assert not info['action_mask'].flags.writeable
+
+@pytest.mark.parametrize('obs_mode', ['dense', 'compact', 'heightmap', 'packed'])
+def test_inplace_copy_obs(obs_mode):
+    # copies are writable and not overwritten by the next step; views are
+    env = BppEnv(obs_mode=obs_mode, inplace=True, copy_obs=True)
+    views = BppEnv(obs_mode=obs_mode, inplace=True)
+    obs, view = env.reset(), views.reset()
+    before = [a.copy() for a in arrays(obs)]
+    for a in arrays(obs):
+        assert a.flags.writeable
+    action = int(np.flatnonzero(env.valids)[0])
+    env.step(action)
+    views.step(action)
+    for a, b in zip(arrays(obs), before):
+        np.testing.assert_array_equal(a, b)
+    assert any(not np.array_equal(a, b) for a, b in zip(arrays(view), before))
+    for a in arrays(obs):
+        a[...] = 0
@@ -0,0 +1,115 @@
+# equivalence tests of the placement engines: the reference cell-by-cell scan ('loop'),
+# summed-area tables ('sat'), bitboards and the placement mask cache
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs.BinPackingLogic import Bin, BitBin, MultiBin, PlacementMaskCache, get_free_widths
+
+SIZES = [(5, 5), (7, 4), (3, 9), (15, 15), (10, 70)]
+
+def random_board(rng, H, W):
+    # random occupancy, from empty to mostly full
+    return (rng.random((H, W)) < rng.choice([0., 0.1, 0.3, 0.6])).astype(int)
+
+def random_shapes(rng, H, W, k=8):
+    # random item sizes (w, h), plus the edge sizes: 1x1, the bin itself and larger than the bin
+    shapes = [(int(rng.integers(1, W+1)), int(rng.integers(1, H+1))) for _ in range(k)]
+    return shapes + [(1, 1), (W, H), (W, 1), (1, H), (W+1, 1), (1, H+1), (W+1, H+1)]
+
+def get_bins(board):
+    H, W = board.shape
+    bins = {'loop': Bin(W, H, engine='loop'), 'sat': Bin(W, H, engine='sat'), 'bitboard': BitBin(W, H)}
+    for b in bins.values():
+        b.pieces = board.copy()
+    return bins
+
+@pytest.mark.parametrize('H, W', SIZES)
+def test_engines_same_masks(H, W):
+    rng = np.random.default_rng(H*100 + W)
+    for _ in range(20):
+        board = random_board(rng, H, W)
+        bins = get_bins(board)
+        for w, h in random_shapes(rng, H, W):
+            expected = bins['loop'].get_placement_mask(w, h)
+            for engine in ('sat', 'bitboard'):
+                np.testing.assert_array_equal(bins[engine].get_placement_mask(w, h), expected,
+                                              err_msg='{} w={} h={}'.format(engine, w, h))
+
+@pytest.mark.parametrize('H, W', SIZES)
+def test_engines_edge_sizes(H, W):
+    empty = get_bins(np.zeros((H, W), dtype=int))
+    full = get_bins(np.ones((H, W), dtype=int))
+    for engine in ('loop', 'sat', 'bitboard'):
+        # an item of the size of the bin fits only in the empty bin, at (0, 0)
+        mask = empty[engine].get_placement_mask(W, H)
+        assert mask.sum() == 1 and mask[0, 0]
+        assert not full[engine].get_placement_mask(W, H).any()
+        # an item larger than the bin never fits
+        assert not empty[engine].get_placement_mask(W+1, H).any()
+        assert not empty[engine].get_placement_mask(W, H+1).any()
+
+@pytest.mark.parametrize('engine', ['sat', 'bitboard'])
+@pytest.mark.parametrize('H, W', SIZES)
+def test_mask_cache_matches_fresh_masks(engine, H, W):
+    # random sequences of placements and unrelated boards; every cached mask must equal a fresh one
+    rng = np.random.default_rng(H*100 + W + 1)
+    cache = PlacementMaskCache(W, H, engine)
+    shapes = random_shapes(rng, H, W, k=4)
+    for _ in range(10):
+        board = np.zeros((H, W), dtype=int)
+        for _ in range(15):
+            if rng.random() < 0.2:
+                board = random_board(rng, H, W)
+            else:
+                h, w = int(rng.integers(1, H+1)), int(rng.integers(1, W+1))
+                i, j = int(rng.integers(0, H-h+1)), int(rng.integers(0, W-w+1))
+                board = board.copy()
+                board[i:i+h, j:j+w] = 1
+            cache.sync(board)
+            fresh = Bin(W, H, engine='loop')
+            fresh.pieces = board
+            for w, h in shapes:
+                np.testing.assert_array_equal(cache.get(w, h), fresh.get_placement_mask(w, h),
+                                              err_msg='w={} h={}'.format(w, h))
+    assert cache.patches > 0
+
+def test_bitboard_numpy_sizes():
+    # bins wider than 64 whose sizes are NumPy integers (as read from arrays)
+    rng = np.random.default_rng(7)
+    H, W = np.int64(10), np.int64(70)
+    for _ in range(30):
+        board = random_board(rng, int(H), int(W))
+        bitbin, ref = BitBin(W, H), Bin(int(W), int(H), engine='sat')
+        bitbin.pieces, ref.pieces = board, board
+        for w, h in random_shapes(rng, int(H), int(W), k=4):
+            np.testing.assert_array_equal(bitbin.get_placement_mask(np.int64(w), np.int64(h)),
+                                          ref.get_placement_mask(w, h))
+
+@pytest.mark.parametrize('H, W', SIZES)
+def test_free_widths(H, W):
+    # widest free rectangle of each height: the widest item of that height with a valid placement
+    rng = np.random.default_rng(H*100 + W + 2)
+    for _ in range(10):
+        board = random_board(rng, H, W)
+        b = Bin(W, H, engine='sat')
+        b.pieces = board
+        expected = [W] + [max([w for w in range(1, W+1) if b.get_placement_mask(w, h).any()], default=0)
+                          for h in range(1, H+1)]
+        np.testing.assert_array_equal(get_free_widths(board), expected)
+
+@pytest.mark.parametrize('H, W', SIZES)
+def test_multi_bin_index(H, W):
+    # the index, updated per placement, equals the free widths of the bins from scratch
+    rng = np.random.default_rng(H*100 + W + 3)
+    bins = MultiBin(3, W, H)
+    for _ in range(3):
+        bins.reset()
+        for _ in range(40):
+            w, h = int(rng.integers(1, max(2, W//2))), int(rng.integers(1, max(2, H//2)))
+            fit = bins.first_fit(w, h) if rng.random() < 0.5 else bins.best_fit(w, h)
+            if fit is None:
+                continue
+            b, move = fit
+            bins.execute_move(b, move, w, h)
+            for k in range(bins.num_bins):
+                np.testing.assert_array_equal(bins.free_widths[k], get_free_widths(bins.pieces[k]))
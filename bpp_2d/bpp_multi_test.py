@@ -0,0 +1,96 @@
+# MultiBinPackingGame (the functional interface over B bins) and BppMultiEnv
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppMultiEnv
+from gym_bpp_2d.envs.BinPackingGame import ItemsGenerator
+from gym_bpp_2d.envs.BinPackingMulti import MultiBinPackingGame
+
+def get_items(game, seed):
+    items_list = ItemsGenerator(6, 6, game.num_items).items_generator(seed)
+    return game.getInitItems(items_list)
+
+def test_multi_game_interface():
+    game = MultiBinPackingGame(8, 8, 10, num_bins=3)
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        boards, items = game.getInitBoard(), get_items(game, seed)
+        assert boards.shape == game.getBoardSize()
+        key = game.stringRepresentation(boards, items)
+        while True:
+            valids = game.get_valid_moves(boards, items)
+            assert len(valids) == game.getActionSize()
+            per_item = valids.reshape(game.num_bins, game.num_items, -1).any(axis=(0, 2))
+            np.testing.assert_array_equal(game.getValidItems(boards, items), per_item)
+            for item in range(game.num_items):
+                np.testing.assert_array_equal(game.getValidPositions(boards, items, item),
+                                              valids.reshape(game.num_bins, game.num_items, -1)[:, item].ravel())
+            # full state: the bins followed by the item planes
+            state = game.getBinItem(boards, items)
+            assert state.shape == (game.num_bins + game.num_items,) + boards.shape[1:]
+            split_boards, split_items = game.split_state(state)
+            np.testing.assert_array_equal(split_boards, boards)
+            np.testing.assert_array_equal(split_items[:, 2], items[:, 2])
+            np.testing.assert_array_equal(game.get_valid_moves(state), valids)
+            assert game.getGameEnded(boards, items) == game.getGameEnded(boards, items, valids) == int(not valids.any())
+            symmetries = game.getSymmetries(boards, valids)
+            assert len(symmetries) == 4
+            for sym_boards, pi in symmetries:
+                assert sym_boards.shape == boards.shape and len(pi) == game.getActionSize()
+            if not valids.any():
+                break
+            action = int(rng.choice(np.flatnonzero(valids)))
+            boards, items, key = game.getNextState(boards, action, items, key)
+            assert key == game.stringRepresentation(boards, items)
+        valids, ended, reward = game.evaluate(boards, items)
+        assert ended and reward == game.getReward(boards, game.getItemsArea(items))
+
+def test_multi_game_hash_per_bin():
+    # the same item in different bins gives different states
+    game = MultiBinPackingGame(8, 8, 10, num_bins=3)
+    boards, items = game.getInitBoard(), get_items(game, 0)
+    size = game.getActionSize() // game.num_bins
+    keys = {game.getNextState(boards, b*size, items, 0)[2] for b in range(game.num_bins)}
+    assert len(keys) == game.num_bins
+
+def test_multi_game_symmetries():
+    # each bin and each policy plane of a bin is transformed as in the single-bin game
+    game = MultiBinPackingGame(6, 4, 3, num_bins=2)
+    rng = np.random.default_rng(0)
+    boards = rng.integers(0, 2, game.getBoardSize())
+    pi = rng.random(game.getActionSize())
+    perms = game.get_symmetry_permutations()
+    for (sym_boards, sym_pi), perm in zip(game.getSymmetries(boards, pi), perms):
+        np.testing.assert_array_equal(sym_boards, boards.reshape(2, -1)[:, perm].reshape(boards.shape))
+        np.testing.assert_array_equal(sym_pi, pi.reshape(2*3, -1)[:, perm].ravel())
+
+def test_multi_game_single_bin_extras():
+    game = MultiBinPackingGame(8, 8, 10, num_bins=3)
+    with pytest.raises(NotImplementedError):
+        game.getHeightmap(game.getInitBoard())
+
+@pytest.mark.parametrize('placement', ['first_fit', 'best_fit'])
+def test_multi_env_placement(placement):
+    # each step places the item at a valid position of the bin chosen by the placement rule
+    env = BppMultiEnv(6, 6, 8, num_bins=3, placement=placement)
+    game = env.game
+    rng = np.random.default_rng(0)
+    for seed in range(10):
+        obs = env.reset(seed=seed)
+        done = False
+        while not done:
+            boards, items = obs['bins'].copy(), obs['items']
+            valids = game.get_valid_moves(boards, items).reshape(env.num_bins, env.num_items_total, -1)
+            np.testing.assert_array_equal(env.get_info()['action_mask'], valids.any(axis=(0, 2)))
+            item = int(rng.choice(np.flatnonzero(env.valids)))
+            free = (boards == 0).sum(axis=(1, 2))
+            fits = np.flatnonzero(valids[:, item].any(axis=1))
+            expected = fits[0] if placement == 'first_fit' else fits[np.argmin(free[fits])]
+            obs, reward, done, _ = env.step(item)
+            changed = np.flatnonzero((obs['bins'] != boards).any(axis=(1, 2)))
+            np.testing.assert_array_equal(changed, [expected])
+            position = np.argwhere(obs['bins'][expected] != boards[expected])[0]
+            assert valids[expected, item, position[0]*env.bin_width + position[1]]
+            assert obs['items'][item, 2] == 1
+            assert not obs['bins'].flags.writeable
+        assert reward == game.getReward(obs['bins'], env.items_total_area)
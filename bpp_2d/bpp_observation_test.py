@@ -0,0 +1,43 @@
+# the observation modes of BppEnv: in their observation space and consistent with the bin
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+
+@pytest.mark.parametrize('inplace', [False, True])
+@pytest.mark.parametrize('obs_mode', ['dense', 'compact', 'heightmap', 'packed'])
+def test_obs_in_observation_space(obs_mode, inplace):
+    env = BppEnv(obs_mode=obs_mode, inplace=inplace)
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        obs = env.reset(seed=seed)
+        done = False
+        while True:
+            assert env.observation_space.contains(obs)
+            if obs_mode == 'heightmap':
+                np.testing.assert_array_equal(obs['heights'], env.game.getHeightmap(env.board))
+            elif obs_mode == 'packed':
+                bits = np.unpackbits(obs['bin'], axis=-1, count=env.bin_width_virtual)
+                np.testing.assert_array_equal(bits, env.board)
+            if done:
+                break
+            obs, _, done, _ = env.step(int(rng.choice(np.flatnonzero(env.valids))))
+
+def test_next_heightmap():
+    # the heightmap updated per move equals the heightmap of the bin
+    env = BppEnv(20, 20, 40, 30, 30)
+    game = env.game
+    rng = np.random.default_rng(0)
+    for seed in range(10):
+        env.reset(seed=seed)
+        board, items = env.board, env.items
+        heights = game.getHeightmap(board)
+        np.testing.assert_array_equal(heights, 0)
+        while True:
+            valids = game.get_valid_moves(board, items)
+            if not valids.any():
+                break
+            action = int(rng.choice(np.flatnonzero(valids)))
+            heights = game.getNextHeightmap(heights, action, items)
+            board, items = game.getNextState(board, action, items)
+            np.testing.assert_array_equal(heights, game.getHeightmap(board))
@@ -0,0 +1,47 @@
+# dense rewards of BppEnv and the O(1) rewards of the tracked bounding box
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+
+def play(envs, rng):
+    # same random valid actions in all envs; the rewards of each env and the last board
+    rewards = [[] for _ in envs]
+    for env in envs:
+        env.reset()
+    while True:
+        action = int(rng.choice(np.flatnonzero(envs[0].valids)))
+        for env, r in zip(envs, rewards):
+            _, reward, done, _ = env.step(action)
+            r.append(reward)
+        if done:
+            return rewards
+
+# a virtual bin of 11 x 11 leaves items unplaced in about half of the random episodes
+@pytest.mark.parametrize('virtual', [15, 11])
+@pytest.mark.parametrize('seed', range(20))
+def test_dense_returns(seed, virtual):
+    # the return of a 'density' episode is the terminal reward; a 'bbox' one the terminal reward
+    # minus the final minimal square bin over the total area
+    rng = np.random.default_rng(seed)
+    envs = [BppEnv(seed=seed, bin_height_virtual=virtual, bin_width_virtual=virtual, reward_mode=mode)
+            for mode in ('terminal', 'density', 'bbox')]
+    terminal, density, bbox = play(envs, rng)
+    assert not any(terminal[:-1])
+    assert sum(density) == pytest.approx(terminal[-1])
+    a = envs[0].game.get_minimal_bin(envs[0].board)
+    assert sum(bbox) == pytest.approx(terminal[-1] - a*a / envs[0].items_total_area)
+
+@pytest.mark.parametrize('virtual', [15, 11])
+@pytest.mark.parametrize('seed', range(20))
+def test_reward_from_box(seed, virtual):
+    # the tracked box gives the reward of the finished board
+    rng = np.random.default_rng(seed)
+    env = BppEnv(seed=seed, bin_height_virtual=virtual, bin_width_virtual=virtual)
+    terminal, = play([env], rng)
+    game = env.game
+    expected = game.getReward(env.board, env.items_total_area)
+    assert game.getRewardFromBox(env.box, env.items_total_area) == pytest.approx(expected)
+    assert terminal[-1] == pytest.approx(expected)
+    placed = env.items[:, 2] == 1
+    assert env.box[2] == (env.items[placed, 0] * env.items[placed, 1]).sum() == env.board.sum()
@@ -0,0 +1,47 @@
+# batched rollouts of RolloutEngine and the batched rewards of BinPackingGame
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs.BinPackingGame import BinPackingGame, ItemsGenerator
+from gym_bpp_2d.envs.BinPackingRollout import RolloutEngine
+
+def get_state(game, seed, moves, rng):
+    # the items of instance seed and a bin with up to moves random items placed
+    board = game.getInitBoard()
+    items = game.getInitItems(ItemsGenerator(10, 10, game.num_items).items_generator(seed))
+    for _ in range(moves):
+        valids = game.get_valid_moves(board, items)
+        if not valids.any():
+            break
+        board, items = game.getNextState(board, int(rng.choice(np.flatnonzero(valids))), items)
+    return board, items
+
+@pytest.mark.parametrize('policy', RolloutEngine.POLICIES)
+def test_rollout_reproducible(policy):
+    game = BinPackingGame(15, 15, 10, n=1)
+    board, items = get_state(game, 0, 3, np.random.default_rng(0))
+    rewards = RolloutEngine(game, policy, seed=7).rollout(board, items, 32)
+    np.testing.assert_array_equal(RolloutEngine(game, policy, seed=7).rollout(board, items, 32), rewards)
+    engine = RolloutEngine(game, policy, seed=1)
+    engine.rollout(board, items, 32)
+    engine.seed(7)
+    np.testing.assert_array_equal(engine.rollout(board, items, 32), rewards)
+    assert engine.rollouts == 64
+    if policy != 'random':
+        # deterministic policies play the same completion every time
+        assert np.all(rewards == rewards[0])
+
+def test_reward_batch_matches_reward():
+    game = BinPackingGame(15, 15, 10, n=1)
+    rng = np.random.default_rng(0)
+    boards, areas, expected = [], [], []
+    for seed in range(30):
+        # finished, unfinished and empty bins
+        board, items = get_state(game, seed, int(rng.integers(0, 12)), rng)
+        area = game.getItemsArea(items)
+        boards.append(board)
+        areas.append(area)
+        expected.append(game.getReward(board, area))
+    rewards = game.getRewardBatch(np.array(boards), np.array(areas))
+    np.testing.assert_allclose(rewards, expected)
+    assert (rewards > 0).any() and (rewards == 0).any()
@@ -0,0 +1,67 @@
+# load test of the local env server: requests/sec and latency for 1 to 64 clients
+# usage: python bpp_server_load.py [--clients 1 4 16 64] [--requests 500]
+# the server runs in its own process; every client is a process with a BppClientEnv
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append('./gym-2d')
+from gym_bpp_2d.envs.bpp_server import serve
+from gym_bpp_2d.envs.bpp_client_env import BppClientEnv
+
+def client(path, seed, num_requests, start, results):
+    # random valid actions; one latency per request (reset or step)
+    env = BppClientEnv(path, seed=seed)
+    rng = np.random.default_rng(seed)
+    latencies = []
+    start.wait()
+    for _ in range(num_requests):
+        t = time.perf_counter()
+        if env.valids.any():
+            _, _, done, _ = env.step(rng.choice(np.flatnonzero(env.valids)))
+        else:
+            done = True
+        if done:
+            env.reset()
+        latencies.append(time.perf_counter() - t)
+    env.close()
+    results.put(latencies)
+
+def run(path, num_clients, num_requests):
+    start = mp.Event()
+    results = mp.Queue()
+    clients = [mp.Process(target=client, args=(path, k, num_requests, start, results)) for k in range(num_clients)]
+    for p in clients:
+        p.start()
+    time.sleep(0.5) # connections
+    t = time.perf_counter()
+    start.set()
+    latencies = np.concatenate([results.get() for _ in clients])
+    elapsed = time.perf_counter() - t
+    for p in clients:
+        p.join()
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--requests', type=int, default=500, help='requests per client')
+    parser.add_argument('--batch-wait', type=float, default=0., help='seconds the server gathers a batch')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bpp.sock')
+    server = mp.Process(target=serve, args=(path,), kwargs={'batch_wait': args.batch_wait}, daemon=True)
+    server.start()
+    while not os.path.exists(path):
+        time.sleep(0.05)
+
+    print('{:>8} {:>12} {:>10} {:>10}'.format('clients', 'requests/s', 'p50 (ms)', 'p99 (ms)'))
+    for num_clients in args.clients:
+        rate, p50, p99 = run(path, num_clients, args.requests)
+        print('{:>8} {:>12.0f} {:>10.3f} {:>10.3f}'.format(num_clients, rate, p50*1e3, p99*1e3))
+    server.terminate()
@@ -0,0 +1,121 @@
+# BppClientEnv on a BppServer (run in a thread) plays as BppEnv
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppClientEnv, BppEnv
+from gym_bpp_2d.envs.bpp_server import BppServer, REQUEST, SEED_WORD
+
+@pytest.fixture
+def server(request):
+    # BppServer keyword arguments from the parameter of the fixture, if any
+    path = os.path.join(tempfile.mkdtemp(), 'bpp.sock')
+    server = BppServer(path, **getattr(request, 'param', {}))
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.run())
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.01)
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+
+@pytest.fixture
+def server_path(server):
+    return server.path
+
+@pytest.mark.parametrize('seed', [3, [1, 2]])
+def test_client_same_as_env(server_path, seed):
+    client = BppClientEnv(server_path, seed=seed, obs_mode='compact')
+    env = BppEnv(seed=seed, obs_mode='compact')
+    rng = np.random.default_rng(0)
+    try:
+        for episode in range(3):
+            obs, env_obs = client.reset(), env.reset()
+            np.testing.assert_array_equal(obs['items'], env_obs['items'])
+            done = False
+            while not done:
+                np.testing.assert_array_equal(client.valids, env.valids)
+                valid = np.flatnonzero(env.valids)
+                action = int(rng.choice(valid)) if rng.random() < 0.9 else int(rng.integers(len(env.valids)))
+                obs, reward, done, _ = client.step(action)
+                env_obs, env_reward, env_done, _ = env.step(action)
+                np.testing.assert_array_equal(obs['bin'], env_obs['bin'])
+                np.testing.assert_array_equal(obs['items'], env_obs['items'])
+                assert reward == pytest.approx(env_reward)
+                assert done == bool(env_done)
+    finally:
+        client.close()
+
+def send_reset(path, seed_words):
+    # a raw connection sending a reset with a list seed, without waiting for the reply
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall(REQUEST.pack(b'l', len(seed_words)) + b''.join(SEED_WORD.pack(w) for w in seed_words))
+    return sock
+
+def assert_closed(sock):
+    # the server closes the connection after the configuration
+    sock.settimeout(5)
+    data = b''
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    sock.close()
+    assert len(data) < 1000
+
+@pytest.mark.parametrize('server', [{'batch_wait': 0.05}], indirect=True)
+def test_bad_reset_fails_alone(server):
+    # a reset that fails in a batch fails only its own request: the step of another client
+    # gathered in the same batch is served
+    client = BppClientEnv(server.path, seed=3)
+    env = BppEnv(seed=3, obs_mode='compact')
+    env.reset()
+    get_instance = server.get_instance
+
+    def failing_get_instance(seed):
+        if seed == (7, 7):
+            raise ValueError('no instance')
+        return get_instance(seed)
+
+    process, sizes = server.process, []
+
+    def recording_process(batch):
+        sizes.append(len(batch))
+        return process(batch)
+
+    server.get_instance, server.process = failing_get_instance, recording_process
+    try:
+        bad = send_reset(server.path, [7, 7])
+        action = int(np.flatnonzero(env.valids)[0])
+        obs, reward, done, _ = client.step(action)
+        env_obs, env_reward, env_done, _ = env.step(action)
+        np.testing.assert_array_equal(obs['bin'], env_obs['bin'])
+        assert sizes == [2]
+        assert_closed(bad)
+        # negative seed words are rejected before they reach a batch
+        assert_closed(send_reset(server.path, [-5]))
+        obs, reward, done, _ = client.step(int(np.flatnonzero(env.valids)[0]))
+        assert obs['bin'].sum() > env_obs['bin'].sum()
+        assert (7, 7) not in server.instances and (-5,) not in server.instances
+    finally:
+        client.close()
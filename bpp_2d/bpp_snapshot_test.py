@@ -0,0 +1,63 @@
+# snapshot/restore of BppEnv: a restored env continues as an env that never left the state
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv
+
+def random_action(env, rng):
+    if env.action_mode == 'factored':
+        item = int(rng.choice(np.flatnonzero(env.valids)))
+        return [item, int(rng.choice(np.flatnonzero(env.get_position_mask(item))))]
+    return int(rng.choice(np.flatnonzero(env.valids)))
+
+def assert_same(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            np.testing.assert_array_equal(a[key], b[key], err_msg=key)
+    else:
+        np.testing.assert_array_equal(a, b)
+
+@pytest.mark.parametrize('inplace', [False, True])
+@pytest.mark.parametrize('obs_mode', ['dense', 'heightmap'])
+@pytest.mark.parametrize('action_mode', ['flat', 'factored', 'corners'])
+def test_restore_then_step(action_mode, obs_mode, inplace):
+    kwargs = dict(obs_mode=obs_mode, action_mode=action_mode, num_corners=4, reward_mode='density')
+    env, ref = BppEnv(inplace=inplace, **kwargs), BppEnv(**kwargs)
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        env.reset(seed=seed)
+        ref.reset(seed=seed)
+        done = False
+        while not done:
+            token = env.snapshot()
+            # a detour of a few steps from the snapshot, then back
+            for _ in range(rng.integers(1, 4)):
+                if not env.valids.any():
+                    break
+                env.step(random_action(env, rng))
+            assert_same(env.restore(token), ref.get_obs())
+            assert_same(env.get_info(), ref.get_info())
+            if action_mode == 'corners':
+                assert env.corner_points.points == ref.corner_points.points
+                assert env.candidates == ref.candidates
+            # the same action from the restored state and from the reference env
+            action = random_action(ref, rng)
+            obs, reward, done, info = env.step(action)
+            ref_obs, ref_reward, ref_done, ref_info = ref.step(action)
+            assert_same(obs, ref_obs)
+            assert_same(info, ref_info)
+            assert reward == pytest.approx(ref_reward)
+            assert done == ref_done
+            assert env.box == ref.box
+
+def test_snapshot_read_only():
+    # arrays shared with a snapshot (and so already returned ones) can't be changed in place
+    env = BppEnv(obs_mode='compact')
+    info = env.get_info()
+    env.snapshot()
+    with pytest.raises(ValueError):
+        info['action_mask'][0] = 1
+    # the next step builds new arrays
+    env.step(int(np.flatnonzero(env.valids)[0]))
+    env.get_info()['action_mask'][0] = 1
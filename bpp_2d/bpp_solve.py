@@ -0,0 +1,43 @@
+# baseline solvers on a benchmark set of instances (ItemsGenerator seeds), in parallel
+# usage:
+#   python bpp_solve.py --method beam --beam-width 16 --seeds 0 100
+#   python bpp_solve.py --method bottom_left --seeds 0 1000 --processes 8 --out results.json
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('./gym-2d')
+from gym_bpp_2d.envs.BinPackingSolver import METHODS, solve_seeds
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default='beam', choices=METHODS)
+    parser.add_argument('--beam-width', type=int, default=16)
+    parser.add_argument('--seeds', type=int, nargs=2, default=[0, 20], help='seed range [first, last)')
+    parser.add_argument('--bin', type=int, nargs=2, default=[10, 10], help='height, width of the sliced bin')
+    parser.add_argument('--virtual-bin', type=int, nargs=2, default=[15, 15], help='height, width of the bin')
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--processes', type=int, default=None, help='process pool size (default: CPU count)')
+    parser.add_argument('--out', default=None, help='where to write the results (JSON)')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = solve_seeds(range(*args.seeds), args.method, args.beam_width, args.bin[0], args.bin[1], args.items,
+                          args.virtual_bin[0], args.virtual_bin[1], args.processes)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print('{:>6} {:>8} {:>10} {:>8} {:>12}'.format('seed', 'reward', 'time (s)', 'nodes', 'nodes/s'))
+        for r in results:
+            print('{:>6} {:>8.4f} {:>10.3f} {:>8} {:>12.0f}'.format(r['seed'], r['reward'], r['time'], r['nodes'],
+                                                                 r['nodes_per_sec']))
+    rewards = np.array([r['reward'] for r in results])
+    print('{} instances, method {}: mean reward {:.4f}, solved (reward > 0) {:.1%}, wall time {:.2f}s'.format(
+        len(results), args.method, rewards.mean(), (rewards > 0).mean(), elapsed))
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'wall_time': elapsed, 'results': results}, f, indent=2)
@@ -0,0 +1,39 @@
+# the baselines of BinPackingSolver: replayable actions, beam search against the greedy methods
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs.BinPackingGame import BinPackingGame, ItemsGenerator
+from gym_bpp_2d.envs.BinPackingSolver import METHODS, Solver, solve_seeds
+
+def get_instance(seed):
+    game = BinPackingGame(15, 15, 10, n=1)
+    return game, game.getInitItems(ItemsGenerator(10, 10, 10).items_generator(seed))
+
+@pytest.mark.parametrize('method', METHODS)
+def test_actions_reproduce_reward(method):
+    # replaying the actions of a solution reaches a finished state with the reported reward
+    for seed in range(5):
+        game, items = get_instance(seed)
+        result = Solver(game, method, beam_width=8).solve(game.getInitBoard(), items)
+        board = game.getInitBoard()
+        for action in result['actions']:
+            assert game.get_valid_moves(board, items)[action]
+            board, items = game.getNextState(board, action, items)
+        assert game.getGameEnded(board, items)
+        assert game.getReward(board, game.getItemsArea(items)) == pytest.approx(result['reward'])
+        assert result['nodes'] >= len(result['actions'])
+
+def test_beam_not_worse_than_greedy():
+    # seed 8: the best finished state of the beam alone is worse than bottom-left-fill
+    for seed in range(12):
+        game, items = get_instance(seed)
+        beam = Solver(game, 'beam', beam_width=16).solve(game.getInitBoard(), items)
+        greedy = Solver(game, 'bottom_left').solve(game.getInitBoard(), items)
+        assert beam['reward'] >= greedy['reward'] - 1e-12
+
+def test_solve_seeds_pool_same_as_serial():
+    keys = ('seed', 'reward', 'actions', 'nodes')
+    serial = solve_seeds(range(4), beam_width=4, processes=1)
+    pooled = solve_seeds(range(4), beam_width=4, processes=2)
+    assert [[r[key] for key in keys] for r in serial] == [[r[key] for key in keys] for r in pooled]
+    assert [r['seed'] for r in serial] == list(range(4))
@@ -0,0 +1,41 @@
+# BppSubprocEnv: same results as one BppVectorEnv; a worker error breaks the env and close() cleans up
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppSubprocEnv, BppVectorEnv
+
+def test_subproc_env_same_as_vector_env():
+    env = BppSubprocEnv(4, num_workers=2, seed=3, obs_mode='compact')
+    venv = BppVectorEnv(4, seeds=env.seeds, obs_mode='compact')
+    try:
+        obs, vobs = env.reset(), venv.reset()
+        rng = np.random.default_rng(0)
+        for _ in range(30):
+            actions = [int(rng.choice(np.flatnonzero(m))) if m.any() else 0 for m in venv.valids]
+            obs, rewards, dones, info = env.step(actions)
+            vobs, vrewards, vdones, vinfo = venv.step(actions)
+            np.testing.assert_array_equal(obs['bin'], vobs['bin'])
+            np.testing.assert_array_equal(obs['items'], vobs['items'])
+            np.testing.assert_array_equal(rewards, vrewards)
+            np.testing.assert_array_equal(dones, vdones)
+            np.testing.assert_array_equal(info['action_mask'], vinfo['action_mask'])
+    finally:
+        env.close()
+
+def test_subproc_env_worker_error():
+    env = BppSubprocEnv(4, num_workers=2)
+    names = [block.name for block in env.blocks.values()]
+    env.reset()
+    # out of range actions raise in the workers
+    with pytest.raises(IndexError):
+        env.step([env.single_action_space.n]*4)
+    assert not env.waiting
+    with pytest.raises(RuntimeError):
+        env.step([0]*4)
+    env.close()
+    assert not any(p.is_alive() for p in env.processes)
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,32 @@
+# symmetries of BinPackingGame: the batched permutations match np.rot90 / np.fliplr
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs.BinPackingGame import BinPackingGame
+
+def reference_symmetries(game, board, pi):
+    # rotations by 180 and 360 degrees of the last two axes, each also flipped left-right
+    pi_planes = np.reshape(pi, (game.num_items, game.bin_height, game.bin_width))
+    result = []
+    for flip in [False, True]:
+        for i in [2, 4]:
+            b, p = np.rot90(board, i, axes=(-2, -1)), np.rot90(pi_planes, i, axes=(-2, -1))
+            if flip:
+                b, p = np.flip(b, -1), np.flip(p, -1)
+            result.append((b, list(p.ravel())))
+    return result
+
+@pytest.mark.parametrize('planes', [None, 1, 4])
+def test_symmetries(planes):
+    game = BinPackingGame(4, 3, 2, n=1)
+    rng = np.random.default_rng(0)
+    shape = (3, 4) if planes is None else (planes, 3, 4)
+    board = rng.integers(0, 2, shape)
+    pi = rng.random(game.getActionSize())
+    symmetries = game.getSymmetries(board, pi)
+    expected = reference_symmetries(game, board, pi)
+    assert len(symmetries) == len(expected)
+    for (b, p), (eb, ep) in zip(symmetries, expected):
+        assert b.shape == board.shape
+        np.testing.assert_array_equal(b, eb)
+        np.testing.assert_allclose(p, ep)
@@ -0,0 +1,46 @@
+# BppVectorEnv must give the same transitions as K independent BppEnv
+import numpy as np
+import pytest
+
+from gym_bpp_2d.envs import BppEnv, BppVectorEnv
+
+@pytest.mark.parametrize('obs_mode', ['dense', 'compact'])
+def test_vector_env_same_as_independent_envs(obs_mode):
+    K = 6
+    rng = np.random.default_rng(0)
+    envs = [BppEnv(seed=k, obs_mode=obs_mode) for k in range(K)]
+    venv = BppVectorEnv(K, seeds=range(K), obs_mode=obs_mode, auto_reset=True)
+
+    def check_obs(vobs, obs, k):
+        if obs_mode == 'dense':
+            np.testing.assert_array_equal(vobs[k], obs)
+        else:
+            for key in ('bin', 'items'):
+                np.testing.assert_array_equal(vobs[key][k], obs[key])
+
+    vobs = venv.reset()
+    for k, env in enumerate(envs):
+        check_obs(vobs, env.reset(), k)
+    episodes = 0
+    for _ in range(300):
+        # a valid action for most envs, a random (mostly invalid) one for the others
+        actions = []
+        for k in range(K):
+            valid = np.flatnonzero(venv.valids[k])
+            if rng.random() < 0.3 or len(valid) == 0:
+                actions.append(int(rng.integers(venv.single_action_space.n)))
+            else:
+                actions.append(int(rng.choice(valid)))
+        vobs, rewards, dones, info = venv.step(actions)
+        for k, env in enumerate(envs):
+            obs, reward, done, env_info = env.step(actions[k])
+            assert rewards[k] == pytest.approx(reward)
+            assert bool(dones[k]) == bool(done)
+            if done:
+                # auto-reset: the last observation is in final_observation
+                check_obs(info['final_observation'], obs, k)
+                obs, env_info = env.reset(), env.get_info()
+                episodes += 1
+            check_obs(vobs, obs, k)
+            np.testing.assert_array_equal(info['action_mask'][k], env_info['action_mask'])
+    assert episodes > 0
@@ -0,0 +1,8 @@
+# pytest configuration of the 2d bpp tests: run from bpp_2d with `python -m pytest`
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gym-2d'))
+
+# bpp_env_test.py is a script (it plays an episode at import), not a test module
+collect_ignore = ['bpp_env_test.py']
@@ -2,17 +2,51 @@ from __future__ import print_function
 import sys
 sys.path.append('.')
 from .Game import Game
-from .BinPackingLogic import Bin
+from .BinPackingLogic import Bin, BitBin, PlacementMaskCache, get_integrals, get_placement_masks, execute_moves
+from .BinPackingLogic import FreeSpaceIndex
+from .BinPackingHash import ZobristHash, TranspositionTable
+from .BinPackingStats import timed
 import numpy as np
 import random
+import copy
 
 class BinPackingGame(Game):
 
-    def __init__(self, bin_width, bin_height, num_items, n):
+    def __init__(self, bin_width, bin_height, num_items, n, engine='sat', mask_cache=True, table_bytes=0):
         self.bin_width = bin_width
         self.bin_height = bin_height
         self.num_items = num_items
         self.n = n # number of bins (currently only one bin)
+        # placement engine:
+        #   'sat' - Bin with summed-area tables (vectorized)
+        #   'bitboard' - BitBin, rows as bitmasks
+        #   'loop' - Bin with the cell-by-cell scan (reference)
+        assert engine in ('sat', 'bitboard', 'loop')
+        self.engine = engine
+        # placement masks cached per item shape and patched locally when the bin changes
+        # (not used by the reference engine)
+        self.mask_cache = None
+        if mask_cache and engine != 'loop':
+            self.mask_cache = PlacementMaskCache(bin_width, bin_height, engine)
+        # widest free rectangle of each height, synced with the bin like the mask cache (getValidItems)
+        self.free_space = FreeSpaceIndex(bin_width, bin_height)
+        # Zobrist hash of states; transposition table for search if table_bytes > 0
+        self.zobrist = ZobristHash(bin_width, bin_height, num_items)
+        self.table = TranspositionTable(table_bytes) if table_bytes > 0 else None
+        # flat index permutations of the symmetries (get_symmetry_permutations)
+        self.symmetry_perms = None
+        # Profiler timing the masks, transitions and termination checks (BinPackingStats), off by default
+        self.profiler = None
+
+    def clone(self):
+        # a game for branching: shares the configuration, hash keys and transposition table,
+        # with its own copy of the placement-mask cache (the masks themselves are shared until patched)
+        # and of the free-space index
+        game = copy.copy(self)
+        if self.mask_cache is not None:
+            game.mask_cache = self.mask_cache.copy()
+        game.free_space = copy.copy(self.free_space)
+        return game
 
     def getInitBoard(self):
         # return initial board (numpy board)
@@ -30,139 +64,402 @@ class BinPackingGame(Game):
 
     def getInitItems(self, items_list):
         # items_list from item generator
-        # 2D format
-        items_list_board = []
+        # compact format: one row (w, h, placed) per item
+        items = np.zeros((self.num_items, 3), dtype=int)
         for i in range(self.num_items):
             w, h, _, _ = items_list[i]
-            item_board = self.getInitBoard()
-            item_board[0:h, 0:w] = 1
-            items_list_board += [item_board]
-        return items_list_board
-    
-    def getItemsUpdated(self, items_list_board, cur_item):
+            items[i] = (w, h, 0)
+        return items
+
+    def getItemsBoard(self, items):
+        # 2D format: one bin_height * bin_width plane per item,
+        # the item is a (h, w) rectangle of 1s in the corner; all 0s once placed
+        # items: N * 3, or a batch ... * N * 3
+        rows = np.arange(self.bin_height)[:, None] < items[..., 1, None, None]
+        cols = np.arange(self.bin_width)[None, :] < items[..., 0, None, None]
+        return (rows & cols & (items[..., 2, None, None] == 0)).astype(int)
+
+    def getItemsFromBoard(self, items_list_board):
+        # compact format from the 2D format
+        items_list_board = np.asarray(items_list_board)
+        w = items_list_board[:, 0, :].sum(axis=1)
+        h = items_list_board[:, :, 0].sum(axis=1)
+        return np.stack([w, h, (w == 0).astype(int)], axis=1)
+
+    def getItemsArea(self, items):
+        # total area of all items
+        return int((items[:, 0] * items[:, 1]).sum())
+
+    def getItemsUpdated(self, items, cur_item):
         # update items
-        items_list_board[cur_item] -= items_list_board[cur_item] # set to 0     
-        return items_list_board
+        items[cur_item, 2] = 1 # placed
+        return items
 
-    def getNextState(self, board, action, items_list_board):
+    @timed('transition')
+    def getNextState(self, board, action, items, key=None):
         # get next board, to see if game ended - xw
         # also the next state to keep game going!
         # action must be a valid move
-        items_list_board = np.copy(items_list_board)
-        b = Bin(self.bin_width, self.bin_height)
+        # items can be in compact format (N * 3) or 2D format (N * H * W); returned in the same format
+        # key: hash of the state (stringRepresentation); if given, the hash of the next state
+        # is updated in O(h*w) and returned as a third value
+        dense = np.ndim(items) == 3
+        if dense:
+            items = self.getItemsFromBoard(items)
+        else:
+            items = np.copy(items)
+        b = self.get_bin()
         b.pieces = np.copy(board)
 
         # decode action to (item, placement)
         cur_item, placement = int(action/(self.bin_height*self.bin_width)), action%(self.bin_height*self.bin_width)        
-        item = items_list_board[cur_item]
-        assert sum(sum(item)) > 0 # must choose a valid item
+        w, h, placed = items[cur_item]
+        assert not placed # must choose a valid item
         # if item is valid:
-        w = sum(item[0,:])
-        h = sum(item[:,0])
         move = (int(placement/self.bin_width), placement%self.bin_width)
         # execute action
         b.execute_move(move, w, h) # update bin
-        items_list_board = self.getItemsUpdated(items_list_board, cur_item) # update items
-        return (b.pieces, items_list_board)
+        items = self.getItemsUpdated(items, cur_item) # update items
+        if dense:
+            items = self.getItemsBoard(items)
+        if key is not None:
+            return (b.pieces, items, self.zobrist.update(key, move, w, h, cur_item))
+        return (b.pieces, items)
+
+    @timed('transition')
+    def applyMove(self, board, action, items):
+        # getNextState in place on a bin and compact items; returns (item, (i, j), w, h)
+        cur_item, placement = divmod(int(action), self.bin_height*self.bin_width)
+        w, h, placed = (int(x) for x in items[cur_item])
+        assert not placed # must choose a valid item
+        i, j = divmod(placement, self.bin_width)
+        assert not board[i:i+h, j:j+w].any()
+        board[i:i+h, j:j+w] = 1
+        items[cur_item, 2] = 1
+        return cur_item, (i, j), w, h
 
-    def getValidMoves(self, board):
+    def split_state(self, board, items=None):
+        # (bin, compact items) from either a full state (N+1) * H * W or a (bin, items) pair
+        if items is None:
+            assert(len(board) == self.num_items+self.n)
+            return board[0], self.getItemsFromBoard(board[1:])
+        if np.ndim(items) == 3:
+            items = self.getItemsFromBoard(items)
+        return board, items
+
+    def getValidMoves(self, board, items=None):
         # return a binary vector
         # size is the same with getActionSize; the value is 1 for valid moves in the 'bin'
-        valids = [0]*self.getActionSize()
-        b = Bin(self.bin_width, self.bin_height)
-        b.pieces = np.copy(board[0])
-        legal_moves = []
+        # board: full state (N+1) * H * W, or the bin with items given separately
+        valids = self.get_valid_moves(board, items)
+        assert valids.any()
+        return valids
+
+    @timed('masks')
+    def get_valid_moves(self, board, items=None, out=None):
+        # getValidMoves, also for states without any valid move (all 0s)
+        # out: int array of the action size to write the valid moves to (returned)
+        board, items = self.split_state(board, items)
+        if out is None:
+            out = np.empty(self.num_items*self.bin_height*self.bin_width, dtype=int)
+        valids = out.reshape(self.num_items, self.bin_height, self.bin_width)
+        get_mask = self.get_mask_function(board)
         for item in range(self.num_items):
-            if sum(sum(board[item+1])) == 0:
-                continue
-            legal_moves += b.get_moves_for_square(board[1:], item)
-        assert len(legal_moves) > 0
-        for item, x, y in legal_moves:
-            valids[(item*(self.bin_height*self.bin_width)+x*self.bin_width+y)] = 1
-        return np.array(valids)
+            w, h, placed = items[item]
+            if placed:
+                valids[item] = 0
+            else:
+                valids[item] = get_mask(w, h)
+        return out
+
+    @timed('masks')
+    def getValidItems(self, board, items=None):
+        # binary vector of size N: 1 for items that can still be placed somewhere
+        # read from the widest free rectangle of each height (FreeSpaceIndex), without
+        # placement masks: an item (h, w) has a valid placement iff some (h, w) rectangle is free
+        board, items = self.split_state(board, items)
+        widths = self.free_space.sync(board)
+        w, h, placed = items.T
+        fits = (h <= self.bin_height) & (widths[np.minimum(h, self.bin_height)] >= w)
+        return (fits & (placed == 0)).astype(int)
+
+    def getValidPositions(self, board, items, item):
+        # binary vector of size H*W: 1 for the valid positions of one item
+        board, items = self.split_state(board, items)
+        w, h, placed = items[item]
+        if placed:
+            return np.zeros(self.bin_height*self.bin_width, dtype=int)
+        return self.get_mask_function(board)(w, h).ravel().astype(int)
 
-    def has_valid_moves(self, board):
+    @timed('masks')
+    def getCornerMoves(self, board, items, corners, num_corners):
+        # binary vector of size N * num_corners: 1 if item n can be placed with its top-left cell
+        # at corner point k (corners: list of at most num_corners points (i, j), CornerPoints)
+        # one rectangle-sum test per (item, corner) on the summed-area table of the bin
+        valids = np.zeros((self.num_items, num_corners), dtype=int)
+        if len(corners) > 0:
+            S = get_integrals(np.asarray(board))
+            ci, cj = np.array(corners).T
+            w, h, placed = items[:, 0, None], items[:, 1, None], items[:, 2, None]
+            inside = (ci + h <= self.bin_height) & (cj + w <= self.bin_width)
+            ih = np.minimum(ci + h, self.bin_height)
+            jw = np.minimum(cj + w, self.bin_width)
+            free = (S[ih, jw] - S[ci, jw] - S[ih, cj] + S[ci, cj]) == 0
+            valids[:, :len(corners)] = inside & free & (placed == 0)
+        return valids.ravel()
+
+    @timed('masks')
+    def getAnchorMoves(self, board, items, num_anchors):
+        # (anchors, valid moves) where getCornerMoves finds none: get_adjacency also accepts
+        # top-left cells that are not corner points; anchors are the first num_anchors positions
+        # (row-major) where some item has a valid move, valid moves as in getCornerMoves
+        valids = self.get_valid_moves(board, items).reshape(self.num_items, -1)
+        positions = np.flatnonzero(valids.any(axis=0))[:num_anchors]
+        anchors = [divmod(int(p), self.bin_width) for p in positions]
+        moves = np.zeros((self.num_items, num_anchors), dtype=int)
+        moves[:, :len(positions)] = valids[:, positions]
+        return anchors, moves.ravel()
+
+    def has_valid_moves(self, board, items=None):
         # any valid move left? game ends or not
-        b = Bin(self.bin_width, self.bin_height)
-        b.pieces = np.copy(board[0])
-        moves = []
+        board, items = self.split_state(board, items)
+        get_mask = self.get_mask_function(board)
         for item in range(self.num_items):
-            if sum(sum(board[item+1])) == 0:
-                # if all items placed, moves = []
+            w, h, placed = items[item]
+            if placed:
+                # if all items placed, no moves
                 continue
-            moves = b.get_moves_for_square(board[1:], item)
-            if len(moves) > 0:
-                break
-        return len(moves) > 0
+            if get_mask(w, h).any():
+                return True
+        return False
 
-    def getGameEnded(self, total_board):
+    def get_mask_function(self, board):
+        # return get_mask(w, h) -> placement mask of an item on this (2D) board
+        if self.mask_cache is not None:
+            self.mask_cache.sync(board)
+            return self.mask_cache.get
+        b = self.get_bin()
+        b.pieces = board
+        return b.get_placement_mask
+
+    def get_bin(self):
+        # an empty bin of the placement engine
+        if self.engine == 'bitboard':
+            return BitBin(self.bin_width, self.bin_height)
+        return Bin(self.bin_width, self.bin_height, self.engine)
+
+    def getMaskCacheStats(self):
+        # hit/patch/miss counts of the placement mask cache
+        if self.mask_cache is None:
+            return {}
+        return self.mask_cache.stats()
+
+    @timed('termination')
+    def getGameEnded(self, total_board, items=None, valids=None):
         # return 0 if game doesn't end; 1 if game ends
-        assert(len(total_board) == self.num_items+self.n)
-        if not self.has_valid_moves(total_board):
+        # valids: valid moves of this state if already computed (get_valid_moves), saves the scan
+        if valids is not None:
+            return int(not valids.any())
+        if not self.has_valid_moves(total_board, items):
             # no legal moves left, game ends
             return 1
         else:
             return 0
 
-    def getBinItem(self, board, items_list_board):
-        # get the state: bin representation + items representation
-        return np.array([board] + list(items_list_board))
+    def stringRepresentation(self, board, items=None):
+        # Zobrist hash of the state (an int), used by MCTS for hashing
+        # board: full state (N+1) * H * W, or the bin with items given separately
+        board, items = self.split_state(board, items)
+        return self.zobrist.hash(board, items)
+
+    def evaluate(self, board, items, key=None):
+        # (valid moves, game ended, reward) of a state, through the transposition table if any
+        # key: hash of the state, computed if not given
+        if self.table is not None:
+            if key is None:
+                key = self.stringRepresentation(board, items)
+            entry = self.table.get(key)
+            if entry is not None:
+                return entry
+        board, items = self.split_state(board, items)
+        valids = self.get_valid_moves(board, items)
+        ended = self.getGameEnded(board, items, valids)
+        reward = self.getReward(board, self.getItemsArea(items)) if ended else 0
+        if self.table is not None:
+            self.table.put(key, valids, ended, reward)
+        return valids, ended, reward
+
+    def getBinItem(self, board, items):
+        # get the state: bin representation + items representation, (N+1) * H * W
+        if np.ndim(items) == 2:
+            items = self.getItemsBoard(items)
+        state = np.empty((self.num_items+1, self.bin_height, self.bin_width), dtype=int)
+        state[0] = board
+        state[1:] = items
+        return state
+
+    def getHeightmap(self, board):
+        # skyline of the bin, W: per column, 1 + its last occupied row (0 for an empty column);
+        # items are packed from the top, so the free cells below the skyline are all reachable
+        board = np.asarray(board)
+        last = self.bin_height - np.argmax(board[::-1] != 0, axis=0)
+        return np.where(board.any(axis=0), last, 0)
+
+    def getNextHeightmap(self, heights, action, items):
+        # heightmap after the action, in O(w); same arguments as getNextState
+        cur_item, placement = divmod(int(action), self.bin_height*self.bin_width)
+        i, j = divmod(placement, self.bin_width)
+        w, h = int(items[cur_item][0]), int(items[cur_item][1])
+        heights = heights.copy()
+        np.maximum(heights[j:j+w], i+h, out=heights[j:j+w])
+        return heights
+
+    def getPackedBin(self, board):
+        # occupancy of the bin bit-packed along the rows, H * ceil(W/8) uint8
+        return np.packbits(np.asarray(board) != 0, axis=-1)
+
+    def getValidMovesBatch(self, boards, items):
+        # valid moves of K games at once
+        # boards: K * H * W, items: K * N * 3; returns a K * action size boolean array
+        # placed items get width 0, which has no placements
+        widths = np.where(items[:, :, 2] == 0, items[:, :, 0], 0)
+        masks = get_placement_masks(boards, widths, items[:, :, 1])
+        return masks.reshape(len(boards), self.getActionSize())
+
+    def getNextStateBatch(self, boards, actions, items):
+        # next states of K games at once; every action must be a valid move
+        boards, items = np.copy(boards), np.copy(items)
+        k = np.arange(len(boards))
+        size_b = self.bin_height*self.bin_width
+        cur_item, placement = actions // size_b, actions % size_b
+        assert not items[k, cur_item, 2].any() # must choose valid items
+        execute_moves(boards, placement // self.bin_width, placement % self.bin_width,
+                      items[k, cur_item, 0], items[k, cur_item, 1])
+        items[k, cur_item, 2] = 1
+        return (boards, items)
+
+    def getBinItemBatch(self, boards, items):
+        # states of K games at once, K * (N+1) * H * W
+        return np.concatenate([boards[:, None], self.getItemsBoard(items)], axis=1)
+
+    def getRewardBatch(self, boards, items_total_area):
+        # rewards of K finished games at once, same as getReward per game
+        rows = boards.any(axis=2)
+        cols = boards.any(axis=1)
+        # last occupied row/column + 1 (1 for an empty bin, as get_minimal_bin)
+        h = np.where(rows.any(axis=1), self.bin_height - np.argmax(rows[:, ::-1], axis=1), 1)
+        w = np.where(cols.any(axis=1), self.bin_width - np.argmax(cols[:, ::-1], axis=1), 1)
+        a = np.maximum(h, w)
+        all_placed = boards.sum(axis=(1, 2)) == items_total_area
+        return np.where(all_placed, items_total_area / (a*a), 0)
 
     def getSymmetries(self, board, pi):
         # get symmetrical state representation
         # rotate 180 degree; flip in two ways
+        # board: the bin (H * W, returned as H * W) or planes C * H * W
         assert(len(pi) == self.getActionSize())  # 1 for pass
-        size_b = self.bin_width * self.bin_height
-        pi_board = []
-        for item in range(self.num_items):
-            pi_board_ = np.reshape(pi[item*size_b:(item+1)*size_b], (self.bin_height, self.bin_width))
-            pi_board.append(pi_board_)
-        l = []
-        for i in [2, 4]:
-            newB = np.rot90(board, i)
-            newPi = []
-            pi_board_c = pi_board.copy()
-            for item in range(self.num_items):
-                pi_board_ = pi_board_c[item]
-                newPi_ = np.rot90(pi_board_, i)
-                newPi += list(newPi_.ravel())
-            l += [(newB, list(np.copy(newPi)))]
-        for i in [2, 4]:
-            newB = np.rot90(board, i)
-            newB = np.fliplr(newB)
-            newPi = []
-            pi_board_c = pi_board.copy()
-            for item in range(self.num_items):
-                pi_board_ = pi_board_c[item]
-                newPi_ = np.rot90(pi_board_, i)
-                newPi_ = np.fliplr(newPi_)
-                newPi += list(newPi_.ravel())
-            l += [(newB, list(np.copy(newPi)))]
-        return l
+        board = np.asarray(board)
+        planes = board[None, None] if board.ndim == 2 else board[None]
+        boards, pis = self.getSymmetriesBatch(planes, np.asarray(pi)[None])
+        if board.ndim == 2:
+            return [(boards[k, 0, 0], list(pis[k, 0])) for k in range(len(boards))]
+        return [(boards[k, 0], list(pis[k, 0])) for k in range(len(boards))]
+
+    def getSymmetriesBatch(self, boards, pis):
+        # symmetries of a batch of examples at once
+        # boards: B * C * H * W (C planes, e.g. the N+1 planes of the state); pis: B * action size
+        # returns S * B * C * H * W boards and S * B * action size policies for the S symmetries,
+        # each one gather through the flat index permutations of get_symmetry_permutations
+        perms = self.get_symmetry_permutations()
+        S, size_b = perms.shape
+        B, C = boards.shape[:2]
+        planes = np.reshape(boards, (B*C, size_b))
+        new_boards = planes[np.arange(B*C)[None, :, None], perms[:, None, :]]
+        # one policy plane per item (and bin, see MultiBinPackingGame)
+        pi_planes = np.reshape(pis, (-1, size_b))
+        new_pis = pi_planes[np.arange(len(pi_planes))[None, :, None], perms[:, None, :]]
+        return (new_boards.reshape((S, B) + boards.shape[1:]),
+                new_pis.reshape(S, B, self.getActionSize()))
+
+    def get_symmetry_permutations(self):
+        # S * (H*W) flat index permutations, one per symmetry: rotations by 180 and 360 degrees
+        # of the bin, each also flipped left-right; symmetric[k] = plane.ravel()[perms[k]]
+        if self.symmetry_perms is None:
+            index = np.arange(self.bin_height*self.bin_width).reshape(self.bin_height, self.bin_width)
+            perms = []
+            for flip in [False, True]:
+                for i in [2, 4]:
+                    p = np.rot90(index, i)
+                    if flip:
+                        p = np.fliplr(p)
+                    perms.append(p.ravel())
+            self.symmetry_perms = np.array(perms)
+        return self.symmetry_perms
 
     def get_minimal_bin(self, board):
         # evaluate packing result: minimal bin size
         # minimal_bin_size = max([h,w])^2
-        for i in reversed(range(self.bin_height)):
-            if sum(board[i,:]) > 0:
-                break
-        h = i + 1
-        for j in reversed(range(self.bin_width)):
-            if sum(board[:,j]) > 0:
-                break
-        w = j + 1
+        rows = np.flatnonzero(np.any(board, axis=1))
+        cols = np.flatnonzero(np.any(board, axis=0))
+        h = rows[-1] + 1 if len(rows) else 1
+        w = cols[-1] + 1 if len(cols) else 1
         a = max([h, w])
-        return a
+        return int(a)
     
     def getReward(self, total_board, items_total_area):
-        if sum(sum(total_board[0,:])) != items_total_area:
+        # total_board: full state (N+1) * H * W, or just the bin
+        board = total_board[0] if np.ndim(total_board) == 3 else total_board
+        if board.sum() != items_total_area:
             # some items are discarded instead of being placed in the bin
             r = 0
         else:
-            a = self.get_minimal_bin(total_board[0,:])
+            a = self.get_minimal_bin(board)
             r = items_total_area / (a*a)
         return r
 
+    def getInitBox(self):
+        # packed bounding box and placed area of the empty bin: (height, width, area)
+        return (0, 0, 0)
+
+    def getNextBox(self, box, action, items):
+        # box after the action, in O(1); same arguments as getNextState
+        cur_item, placement = divmod(int(action), self.bin_height*self.bin_width)
+        i, j = divmod(placement, self.bin_width)
+        w, h = int(items[cur_item][0]), int(items[cur_item][1])
+        return (max(box[0], i+h), max(box[1], j+w), box[2] + w*h)
+
+    def getRewardFromBox(self, box, items_total_area):
+        # getReward from the tracked box, in O(1)
+        if box[2] != items_total_area:
+            # some items are discarded instead of being placed in the bin
+            return 0
+        a = max(box[0], box[1], 1)
+        return items_total_area / (a*a)
+
+    def get_density(self, box):
+        # placed area / minimal square bin of the box
+        a = max(box[0], box[1])
+        return box[2] / (a*a) if a > 0 else 0
+
+    def getStepReward(self, prev_box, box, items_total_area, done, mode='terminal'):
+        # reward of one transition from the boxes before and after it, in O(1)
+        # mode:
+        #   'terminal' - getReward at the end of the game, 0 before
+        #   'bbox' - penalty for the growth of the minimal square bin, (a'^2 - a^2) / total area,
+        #            plus the terminal reward
+        #   'density' - increase of the density placed area / a^2; at the end the return adds
+        #               up to the terminal reward
+        r = self.getRewardFromBox(box, items_total_area) if done else 0
+        if mode == 'bbox':
+            a0, a1 = max(prev_box[0], prev_box[1]), max(box[0], box[1])
+            r -= (a1*a1 - a0*a0) / items_total_area
+        elif mode == 'density':
+            # sum of the increases = density at the end = terminal reward if all items are placed
+            r = self.get_density(box) - self.get_density(prev_box)
+            if done and box[2] != items_total_area:
+                r -= self.get_density(box)
+        return r
+
 
 class ItemsGenerator():
 
@@ -170,36 +467,40 @@ class ItemsGenerator():
         self.bin_width = bin_width
         self.bin_height = bin_height
         self.n = items
+        # every split adds one item; a 1x1 item can't be split
+        assert self.n <= self.bin_width * self.bin_height
 
     def items_generator(self, seed):
-        np.random.seed(seed)
-        item_list = [[self.bin_width, self.bin_height, 0, 0]] # initial item equals to the bin
-
-        while len(item_list) < self.n:
-            axis = np.random.randint(2) # 0 for x , 1 for y axis
-            idx_item = np.random.randint(len(item_list)) # choose an item to split
-            [w, h, a, b] = item_list[idx_item]
-            if axis == 0:
-                if w == 1:
-                    continue
-                x_split = np.random.randint(a+1, a+w)
-                new_w = x_split - a
-                item_s1 = [new_w, h, a, b]
-                item_list.append(item_s1)
-                item_s2 = [w-new_w, h, x_split, b]
-                item_list.append(item_s2)
-                item_list.pop(idx_item)
-            elif axis == 1:
-                if h == 1:
-                    continue
-                y_split = np.random.randint(b+1, b+h)
-                new_h = y_split - b
-                item_s1 = [w, new_h, a, b]
-                item_list.append(item_s1)
-                item_s2 = [w, h-new_h, a, y_split]
-                item_list.append(item_s2)
-                item_list.pop(idx_item)
-        return item_list
+        # one instance: N items [w, h, x, y] slicing the bin, from its own random generator
+        # seed: anything np.random.default_rng accepts (an int, a list of ints, a Generator)
+        return self.generate(1, seed)[0].tolist()
+
+    def generate(self, num_instances, seed):
+        # M instances at once, an M * N * 4 array of items [w, h, x, y]
+        # each step splits one item of every instance, chosen uniformly among the
+        # (item, axis) pairs that can be split, at a uniform position
+        rng = np.random.default_rng(seed)
+        M = num_instances
+        m = np.arange(M)
+        items = np.zeros((M, self.n, 4), dtype=int)
+        items[:, 0] = [self.bin_width, self.bin_height, 0, 0] # initial item equals to the bin
+        for t in range(1, self.n):
+            # size along the axis: 0 for x (w), 1 for y (h); splittable if > 1
+            sizes = items[:, :t, :2]
+            scores = np.where(sizes > 1, rng.random((M, t, 2)), -1)
+            choice = np.argmax(scores.reshape(M, -1), axis=1)
+            idx_item, axis = choice // 2, choice % 2
+            item = items[m, idx_item].copy()
+            size = item[m, axis]
+            cut = 1 + (rng.random(M) * (size-1)).astype(int)
+            # first part keeps the corner; second part starts at the cut
+            first, second = item.copy(), item.copy()
+            first[m, axis] = cut
+            second[m, axis] = size - cut
+            second[m, axis+2] += cut
+            items[m, idx_item] = first
+            items[:, t] = second
+        return items
 
     # def items_generator_set_one_dim(self, seed, numbers_for_one_dim, mode='random'):
     #     # for 2D items: given the value of one dimension
@@ -220,4 +521,34 @@ class ItemsGenerator():
     #                 break
     #     for i in range(len(numbers_for_one_dim)):
     #         item_list.append([int(numbers_for_one_dim[i]), int(dim_values[i]), 0, 0])
-    #     return item_list 
\ No newline at end of file
+    #     return item_list 
+
+
+class InstanceStore():
+    """
+    Instances (M * N * [w, h, x, y]) kept in a .npy file and memory-mapped,
+    so environments can draw the same instance set by index without generating it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.instances = np.load(path, mmap_mode='r')
+
+    @staticmethod
+    def create(path, generator, num_instances, seed, chunk_size=4096):
+        # generate num_instances with generator (ItemsGenerator) into path, chunk by chunk
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.int32, shape=(num_instances, generator.n, 4))
+        seeds = np.random.SeedSequence(seed).spawn((num_instances + chunk_size - 1) // chunk_size)
+        for c, start in enumerate(range(0, num_instances, chunk_size)):
+            end = min(start + chunk_size, num_instances)
+            out[start:end] = generator.generate(end - start, seeds[c])
+        out.flush()
+        del out
+        return InstanceStore(path)
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __getitem__(self, index):
+        # one instance as a list of items [w, h, x, y]
+        return np.asarray(self.instances[index]).tolist()
@@ -0,0 +1,98 @@
+"""
+Zobrist hashing of bin packing states and a transposition table for tree search.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+class ZobristHash():
+    """One random 64-bit key per bin cell and per item, and per item and size.
+
+    The hash of a state is the XOR of the keys of its occupied cells and placed items,
+    so placing an item (h, w) updates it in O(h*w) and the same packing reached through
+    different item orders gets the same hash. The keys of the sizes of all items (the
+    instance) are XORed in as well: they do not change with the moves, but keep apart the
+    states of different instances with the same bin and placed items.
+    """
+
+    def __init__(self, bin_width, bin_height, num_items, seed=0):
+        rng = np.random.default_rng(seed)
+        self.cell_keys = rng.integers(0, 2**64, size=(bin_height, bin_width), dtype=np.uint64)
+        self.item_keys = rng.integers(0, 2**64, size=num_items, dtype=np.uint64)
+        # item n of width w / height h; the last key stands for any size larger than the bin
+        self.width_keys = rng.integers(0, 2**64, size=(num_items, bin_width+2), dtype=np.uint64)
+        self.height_keys = rng.integers(0, 2**64, size=(num_items, bin_height+2), dtype=np.uint64)
+
+    def hash(self, board, items):
+        # full hash of a state (bin, compact items)
+        cells = np.bitwise_xor.reduce(self.cell_keys[np.asarray(board) != 0])
+        placed = np.bitwise_xor.reduce(self.item_keys[items[:, 2] != 0])
+        return int(cells ^ placed ^ self.instance_key(items))
+
+    def instance_key(self, items):
+        # XOR of the keys of the item sizes
+        n = np.arange(len(items))
+        w = np.minimum(items[:, 0], self.width_keys.shape[1]-1)
+        h = np.minimum(items[:, 1], self.height_keys.shape[1]-1)
+        return np.bitwise_xor.reduce(self.width_keys[n, w] ^ self.height_keys[n, h])
+
+    def update(self, key, move, w, h, item):
+        # hash after placing item (h, w) at move = (i, j)
+        i, j = move
+        cells = np.bitwise_xor.reduce(self.cell_keys[i:i+h, j:j+w], axis=None)
+        return key ^ int(cells) ^ int(self.item_keys[item])
+
+
+class TranspositionTable():
+    """Valid moves, terminal flag and reward per state hash, with LRU eviction.
+
+    max_bytes bounds the memory of the stored entries; valid moves are kept bit-packed.
+    """
+    # bookkeeping bytes per entry (dict slot, tuple, integers)
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes=64*2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        # (valids, ended, reward) or None; valids as returned by get_valid_moves
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        packed, size, ended, reward = entry
+        valids = np.unpackbits(packed, count=size).astype(int)
+        return valids, ended, reward
+
+    def put(self, key, valids, ended, reward):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+        packed = np.packbits(np.asarray(valids, dtype=bool))
+        self.entries[key] = (packed, len(valids), ended, reward)
+        self.nbytes += packed.nbytes + self.ENTRY_OVERHEAD
+        while self.nbytes > self.max_bytes and self.entries:
+            _, (old, _, _, _) = self.entries.popitem(last=False)
+            self.nbytes -= old.nbytes + self.ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
@@ -14,23 +14,47 @@ x is the column, y is the row.
 """
 Inherited from OthelloLogic.py, for bin configuration in bin packing problem.
 """
+import copy
+
 import numpy as np
 
 class Bin():
 
-    def __init__(self, bin_width, bin_height):
+    def __init__(self, bin_width, bin_height, engine='sat'):
         "Set up initial bin configuration."
         self.bin_width = bin_width
         self.bin_height = bin_height
+        # engine for valid placements:
+        #   'sat' - summed-area table (integral image) of the bin, one vectorized pass per item
+        #   'loop' - reference cell-by-cell scan, kept for equivalence tests
+        assert engine in ('sat', 'loop')
+        self.engine = engine
         # Create the empty bin array, height * width
         self.pieces = [None]*self.bin_height
         for i in range(self.bin_height):
             self.pieces[i] = [0]*self.bin_width
 
+    @property
+    def pieces(self):
+        return self._pieces
+
+    @pieces.setter
+    def pieces(self, pieces):
+        # the integral image is only valid for the current pieces
+        self._pieces = pieces
+        self._integral = None
+
     # add [][] indexer syntax to the Bin
     def __getitem__(self, index): 
         return self.pieces[index]
 
+    def get_integral(self):
+        # summed-area table, (bin_height+1) * (bin_width+1)
+        # integral[i, j] = sum of pieces[:i, :j]
+        if self._integral is None:
+            self._integral = get_integrals(np.asarray(self.pieces))
+        return self._integral
+
     def get_adjacency(self, i, j, h, w):
         # important: adjacency rule
         # for a placement to be valid, the item must be adjacent to either the bin boarder or other items
@@ -64,12 +88,41 @@ class Bin():
         # at least having adjacency in two directions
         return adjacent_direction == 2
 
+    def get_placement_window(self, w, h, i0, i1, j0, j1):
+        # valid placements for an item (h, w) at positions i in [i0, i1), j in [j0, j1)
+        # the window must lie inside the feasible positions [0, bin_height-h] * [0, bin_width-w]
+        # a placement (i, j) is valid if the rectangle is free and get_adjacency holds;
+        # each test is a rectangle sum read from the integral image:
+        #   free: rectangle (i, j, h, w) sums to 0
+        #   up:   i == 0 or row segment (i-1, j, 1, w) is not 0
+        #   left: j == 0 or column segment (i, j-1, h, 1) is not 0
+        return window_mask(self.get_integral(), w, h, i0, i1, j0, j1)
+
+    def get_placement_mask(self, w, h):
+        # valid placements for an item (h, w) as a bin_height * bin_width boolean mask
+        mask = np.zeros((self.bin_height, self.bin_width), dtype=bool)
+        if h > self.bin_height or w > self.bin_width:
+            return mask
+        if self.engine == 'loop':
+            for i, j in self._get_moves_loop(w, h):
+                mask[i, j] = True
+        else:
+            mask[:self.bin_height-h+1, :self.bin_width-w+1] = self.get_placement_window(
+                w, h, 0, self.bin_height-h+1, 0, self.bin_width-w+1)
+        return mask
+
     def get_moves_for_square(self, items_list_board, item_idx):
         # get moves for each available item
         item = items_list_board[item_idx] # 2d format
         assert sum(sum(item)) > 0
         w = sum(item[0,:])
         h = sum(item[:,0]) 
+        if self.engine == 'loop':
+            return [(item_idx, i, j) for i, j in self._get_moves_loop(w, h)]
+        return [(item_idx, int(i), int(j)) for i, j in zip(*np.nonzero(self.get_placement_mask(w, h)))]
+
+    def _get_moves_loop(self, w, h):
+        # reference implementation: check every position cell by cell
         moves = []
         # current item to be placed
         for i in range(self.bin_height-h+1):
@@ -77,7 +130,7 @@ class Bin():
                 if sum(sum(self[i:i+h, j:j+w])) == 0:
                     adjacent = self.get_adjacency(i, j, h, w)
                     if adjacent:
-                        moves.append((item_idx, i, j))
+                        moves.append((i, j))
         return moves
 
     def execute_move(self, move, w, h):
@@ -90,4 +143,466 @@ class Bin():
         i, j = move
         assert(sum(sum(pieces[i:i+h, j:j+w])) == 0)
         pieces[i:i+h, j:j+w] = 1
-        self.pieces = pieces.copy()
\ No newline at end of file
+        self.pieces = pieces.copy()
+
+class BitBin():
+    """Bin stored as one integer bitmask per row, bit j = column j.
+
+    Same interface as Bin; placement tests are shift/AND operations on the rows.
+    Rows are a uint64 array for bins up to 64 wide, Python integers beyond that.
+    """
+
+    def __init__(self, bin_width, bin_height):
+        # Python integers: shifts of NumPy integers would overflow beyond 64 bits
+        self.bin_width = int(bin_width)
+        self.bin_height = int(bin_height)
+        # word: converts Python integers (constants, shift counts) to the row type
+        if self.bin_width <= 64:
+            self.dtype, self.word = np.uint64, np.uint64
+        else:
+            self.dtype, self.word = object, int
+        self.full = self.word((1 << self.bin_width) - 1)
+        self.columns = np.arange(self.bin_width).astype(self.dtype)
+        self.rows = np.zeros(self.bin_height, dtype=self.dtype)
+        self._pieces = None
+
+    @property
+    def pieces(self):
+        if self._pieces is None:
+            self._pieces = ((self.rows[:, None] >> self.columns) & self.word(1)).astype(int)
+        return self._pieces
+
+    @pieces.setter
+    def pieces(self, pieces):
+        pieces = np.asarray(pieces)
+        self.rows = np.bitwise_or.reduce(pieces.astype(self.dtype) << self.columns, axis=1)
+        self._pieces = pieces
+
+    def __getitem__(self, index):
+        return self.pieces[index]
+
+    def run(self, rows, w):
+        # bit j set if cells j..j+w-1 of the row are all set (and inside the bin)
+        covered = 1
+        while covered < w:
+            s = min(covered, w - covered)
+            rows = rows & (rows >> self.word(s))
+            covered += s
+        return rows
+
+    def window(self, rows, h, op):
+        # reduce h consecutive rows with op: result[i] = op(rows[i], ..., rows[i+h-1])
+        covered = 1
+        while covered < h:
+            s = min(covered, h - covered)
+            rows = op(rows[:-s], rows[s:])
+            covered += s
+        return rows
+
+    def get_placement_rows(self, w, h, i0, i1):
+        # bitmasks of valid positions for an item (h, w) in rows [i0, i1), see Bin.get_placement_window
+        if i1 <= i0:
+            return np.zeros(0, dtype=self.dtype)
+        lo = max(i0-1, 0)
+        free_w = self.run(~self.rows[lo:i1+h-1] & self.full, w)
+        # free: the w-runs of free cells hold in h consecutive rows
+        free = self.window(free_w[i0-lo:], h, np.bitwise_and)
+        # up: i == 0 or some cell of the row above is occupied
+        up = np.empty(i1-i0, dtype=self.dtype)
+        if i0 == 0:
+            up[:1] = self.full
+            up[1:] = self.full ^ free_w[:i1-1]
+        else:
+            up[:] = self.full ^ free_w[:i1-i0]
+        # left: j == 0 or some cell of the column on the left is occupied
+        occupied = self.window(self.rows[i0:i1+h-1], h, np.bitwise_or)
+        left = ((occupied << self.word(1)) | self.word(1)) & self.full
+        return free & up & left
+
+    def get_placement_window(self, w, h, i0, i1, j0, j1):
+        bits = self.get_placement_rows(w, h, i0, i1)
+        return ((bits[:, None] >> self.columns[j0:j1]) & self.word(1)).astype(bool)
+
+    def get_placement_mask(self, w, h):
+        # valid placements for an item (h, w) as a bin_height * bin_width boolean mask
+        mask = np.zeros((self.bin_height, self.bin_width), dtype=bool)
+        if h > self.bin_height or w > self.bin_width:
+            return mask
+        mask[:self.bin_height-h+1] = self.get_placement_window(w, h, 0, self.bin_height-h+1, 0, self.bin_width)
+        return mask
+
+    def get_moves_for_square(self, items_list_board, item_idx):
+        item = items_list_board[item_idx] # 2d format
+        assert sum(sum(item)) > 0
+        w = int(sum(item[0,:]))
+        h = int(sum(item[:,0]))
+        return [(item_idx, int(i), int(j)) for i, j in zip(*np.nonzero(self.get_placement_mask(w, h)))]
+
+    def execute_move(self, move, w, h):
+        """Only update the bin.
+        """
+        i, j = move
+        bits = self.word(((1 << int(w)) - 1) << int(j))
+        assert not (self.rows[i:i+h] & bits).any()
+        rows = self.rows.copy()
+        rows[i:i+h] |= bits
+        self.rows = rows
+        self._pieces = None
+
+
+class PlacementMaskCache():
+    """Placement masks keyed by item shape (w, h), kept in sync with one bin.
+
+    When the bin changes, a cached mask is only recomputed inside the window of
+    positions whose rectangle or up/left adjacency cells overlap the changed cells.
+    """
+
+    def __init__(self, bin_width, bin_height, engine='sat'):
+        self.bin_width = bin_width
+        self.bin_height = bin_height
+        self.bin = BitBin(bin_width, bin_height) if engine == 'bitboard' else Bin(bin_width, bin_height)
+        self.bin.pieces = np.zeros((bin_height, bin_width), dtype=int)
+        # (w, h) -> [mask, dirty], dirty = (r0, r1, c0, c1) cells changed since mask was computed
+        self.masks = {}
+        # hits: served as is; patches: recomputed in a window; misses: computed from scratch
+        self.hits = 0
+        self.patches = 0
+        self.misses = 0
+
+    def sync(self, board):
+        # point the cache to board; mark the changed cells dirty for every cached mask
+        changed = np.not_equal(board, self.bin.pieces)
+        rows = np.flatnonzero(changed.any(axis=1))
+        if len(rows) == 0:
+            return
+        cols = np.flatnonzero(changed.any(axis=0))
+        r0, r1, c0, c1 = rows[0], rows[-1]+1, cols[0], cols[-1]+1
+        self.bin.pieces = np.array(board, copy=True)
+        for entry in self.masks.values():
+            if entry[1] is None:
+                entry[1] = (r0, r1, c0, c1)
+            else:
+                d = entry[1]
+                entry[1] = (min(d[0], r0), max(d[1], r1), min(d[2], c0), max(d[3], c1))
+
+    def get(self, w, h):
+        # placement mask (bin_height * bin_width, read-only) of an item (h, w) on the synced bin
+        entry = self.masks.get((w, h))
+        if entry is None:
+            self.misses += 1
+            mask = self.bin.get_placement_mask(w, h)
+            mask.setflags(write=False)
+            self.masks[(w, h)] = [mask, None]
+            return mask
+        mask, dirty = entry
+        if dirty is None or h > self.bin_height or w > self.bin_width:
+            self.hits += 1
+            entry[1] = None
+            return mask
+        # positions (i, j) whose cells [i-1, i+h) * [j-1, j+w) overlap the dirty cells
+        r0, r1, c0, c1 = dirty
+        i0, i1 = max(r0-h+1, 0), min(r1+1, self.bin_height-h+1)
+        j0, j1 = max(c0-w+1, 0), min(c1+1, self.bin_width-w+1)
+        self.patches += 1
+        mask = mask.copy()
+        if i0 < i1 and j0 < j1:
+            mask[i0:i1, j0:j1] = self.bin.get_placement_window(w, h, i0, i1, j0, j1)
+        mask.setflags(write=False)
+        entry[0], entry[1] = mask, None
+        return mask
+
+    def copy(self):
+        # independent cache sharing the (read-only) masks and bin arrays
+        cache = copy.copy(self)
+        cache.bin = copy.copy(self.bin)
+        cache.masks = {shape: list(entry) for shape, entry in self.masks.items()}
+        return cache
+
+    def stats(self):
+        return {'hits': self.hits, 'patches': self.patches, 'misses': self.misses,
+                'shapes': len(self.masks)}
+
+
+class CornerPoints():
+    """Corner points of a bin: free cells with the border or an occupied cell both above and on the left.
+
+    An item whose top-left cell is a corner point satisfies get_adjacency, so it can be
+    placed there whenever its rectangle is free. The set is updated in O(h+w) per placement
+    (plus a pass over the points to drop the covered ones) instead of scanning the bin.
+    """
+
+    def __init__(self, bin_width, bin_height):
+        self.bin_width = bin_width
+        self.bin_height = bin_height
+        self.points = {(0, 0)}
+
+    def reset(self, board):
+        # all corner points of board
+        occupied = np.asarray(board) != 0
+        up = np.ones_like(occupied)
+        up[1:] = occupied[:-1]
+        left = np.ones_like(occupied)
+        left[:, 1:] = occupied[:, :-1]
+        self.points = {(int(i), int(j)) for i, j in zip(*np.nonzero(~occupied & up & left))}
+
+    def is_corner(self, board, i, j):
+        return (board[i, j] == 0 and (i == 0 or board[i-1, j] != 0)
+                and (j == 0 or board[i, j-1] != 0))
+
+    def update(self, board, move, w, h):
+        # board: after placing an item (h, w) at move = (i, j)
+        # covered points are dropped; only cells right below or right of the item can become corners
+        # (the points are a new set, so snapshots holding the old one stay valid)
+        i, j = move
+        self.points = {(r, c) for r, c in self.points if not (i <= r < i+h and j <= c < j+w)}
+        if i+h < self.bin_height:
+            for c in range(j, j+w):
+                if self.is_corner(board, i+h, c):
+                    self.points.add((i+h, c))
+        if j+w < self.bin_width:
+            for r in range(i, i+h):
+                if self.is_corner(board, r, j+w):
+                    self.points.add((r, j+w))
+
+    def get(self, k):
+        # the first k corner points in row-major order
+        return sorted(self.points)[:k]
+
+
+class FreeSpaceIndex():
+    """Widest free rectangle of every height of one bin (get_free_widths), kept in sync with it.
+
+    When the bin changes, only the spans (get_free_spans) of the rows whose free cells
+    upwards changed are recomputed.
+    """
+
+    def __init__(self, bin_width, bin_height):
+        self.bin_width = bin_width
+        self.bin_height = bin_height
+        self.reset()
+
+    def reset(self):
+        # empty bin
+        self.up = np.tile(np.arange(1, self.bin_height+1)[:, None], (1, self.bin_width))
+        self.spans = np.full((self.bin_height, self.bin_width), self.bin_width, dtype=int)
+        self.widths = np.full(self.bin_height+1, self.bin_width, dtype=int)
+
+    def sync(self, board):
+        # point the index to board; returns the widths (H+1)
+        up = get_free_up(board)
+        rows = np.flatnonzero((up != self.up).any(axis=1))
+        if len(rows):
+            r0, r1 = rows[0], rows[-1]+1
+            self.spans = self.spans.copy()
+            self.spans[r0:r1] = get_free_spans(up[r0:r1])
+            self.up = up
+            self.widths = get_widths_from_spans(up, self.spans)
+        return self.widths
+
+
+class MultiBin():
+    """B bins of the same size with a free-space index, for packing into many bins.
+
+    For each bin the index keeps the widest free rectangle of every height (FreeSpaceIndex),
+    the free area and the corner points. Only the bin that receives an item is updated, and
+    a query for an item (w, h) is one vectorized test
+    over the index, free_widths[:, h] >= w, so the bins the item cannot fit in are skipped
+    without scanning their boards.
+    """
+
+    def __init__(self, num_bins, bin_width, bin_height, engine='sat'):
+        self.num_bins = num_bins
+        self.bin_width = bin_width
+        self.bin_height = bin_height
+        self.engine = engine
+        self.pieces = np.zeros((num_bins, bin_height, bin_width), dtype=int)
+        # placement mask cache per bin, created when the bin is first searched
+        self.caches = {}
+        self.reset()
+
+    def reset(self):
+        # all bins empty
+        self.pieces[:] = 0
+        self.free_widths = np.full((self.num_bins, self.bin_height+1), self.bin_width, dtype=int)
+        self.free_space = [FreeSpaceIndex(self.bin_width, self.bin_height) for _ in range(self.num_bins)]
+        self.free_area = np.full(self.num_bins, self.bin_width*self.bin_height, dtype=int)
+        self.corners = [CornerPoints(self.bin_width, self.bin_height) for _ in range(self.num_bins)]
+
+    def fits(self, w, h):
+        # boolean B: bins with a valid placement of an item (h, w)
+        if w <= 0 or h <= 0 or w > self.bin_width or h > self.bin_height:
+            return np.zeros(self.num_bins, dtype=bool)
+        return self.free_widths[:, h] >= w
+
+    def get_placement_mask(self, b, w, h):
+        # valid placements of an item (h, w) in bin b, H * W (read-only)
+        cache = self.caches.get(b)
+        if cache is None:
+            cache = self.caches[b] = PlacementMaskCache(self.bin_width, self.bin_height, self.engine)
+        cache.sync(self.pieces[b])
+        return cache.get(w, h)
+
+    def get_position(self, b, w, h):
+        # position of an item (h, w) in bin b: the first corner point (row-major) where its
+        # rectangle is free, else the first valid position; None if it does not fit
+        board = self.pieces[b]
+        for i, j in self.corners[b].get(len(self.corners[b].points)):
+            if i+h <= self.bin_height and j+w <= self.bin_width and not board[i:i+h, j:j+w].any():
+                return (i, j)
+        mask = self.get_placement_mask(b, w, h)
+        if not mask.any():
+            return None
+        return divmod(int(mask.argmax()), self.bin_width)
+
+    def first_fit(self, w, h):
+        # (bin, position) in the first bin the item (h, w) fits in, None if there is none
+        fit = self.fits(w, h)
+        if not fit.any():
+            return None
+        b = int(fit.argmax())
+        return b, self.get_position(b, w, h)
+
+    def best_fit(self, w, h):
+        # (bin, position) in the fullest bin the item (h, w) fits in (least free area, then first)
+        fit = self.fits(w, h)
+        if not fit.any():
+            return None
+        b = int(np.where(fit, self.free_area, self.bin_width*self.bin_height+1).argmin())
+        return b, self.get_position(b, w, h)
+
+    def execute_move(self, b, move, w, h):
+        # place an item (h, w) at move = (i, j) of bin b, in place; updates the index of bin b only
+        i, j = move
+        board = self.pieces[b]
+        assert not board[i:i+h, j:j+w].any()
+        board[i:i+h, j:j+w] = 1
+        self.free_widths[b] = self.free_space[b].sync(board)
+        self.free_area[b] -= w*h
+        self.corners[b].update(board, move, w, h)
+
+
+def get_free_widths(board):
+    """Widest free rectangle of each height in a bin: H+1 widths, widths[0] = W.
+
+    A rectangle (h, w) is free somewhere in the bin iff widths[h] >= w. A free rectangle
+    can always be slid up and left until it touches the border or an item on both sides,
+    so it then also has a valid placement (get_adjacency).
+    O(H*W*log W), vectorized; see get_free_spans.
+    """
+    up = get_free_up(board)
+    return get_widths_from_spans(up, get_free_spans(up))
+
+
+def get_free_up(board):
+    # up[i, j]: free cells from (i, j) upwards
+    free = np.asarray(board) == 0
+    rows = np.arange(free.shape[0])[:, None]
+    return rows - np.maximum.accumulate(np.where(free, -1, rows), axis=0)
+
+
+def get_free_spans(up):
+    """Width of the free rectangle of height up[i, j] through each cell (i, j).
+
+    It spans the columns around j of row i that are at least as tall as up[i, j]. Every
+    widest free rectangle of some height is one of those, and the spans of a row only
+    depend on the up of that row.
+    """
+    H, W = up.shape
+    spans = get_right_spans(np.concatenate([up, up[:, ::-1]]).astype(np.int32))
+    return (spans[:H] + spans[H:, ::-1] - 1).astype(int)
+
+
+def get_right_spans(up):
+    # per cell (i, j), the columns j, j+1, ... of row i up to the first one lower than up[i, j];
+    # binary lifting over the minima of 2^k consecutive columns (-1 past the last column)
+    H, W = up.shape
+    m = np.full((H, W+1), -1, dtype=up.dtype)
+    m[:, :W] = up
+    minima = [m.ravel()]
+    while 2**len(minima) <= W:
+        s = 2**(len(minima)-1)
+        m = np.full((H, W+1), -1, dtype=up.dtype)
+        prev = minima[-1].reshape(H, W+1)
+        np.minimum(prev[:, :W+1-s], prev[:, s:], out=m[:, :W+1-s])
+        minima.append(m.ravel())
+    # flat index of the end of the span in the minima
+    start = np.arange(H, dtype=np.intp)[:, None] * (W+1) + np.arange(W)
+    end = start.copy()
+    for k in range(len(minima)-1, -1, -1):
+        end += (1 << k) * (minima[k][end] >= up)
+    return end - start
+
+
+def get_widths_from_spans(up, spans):
+    # widest rectangle of each height exactly, then of each height or taller
+    H, W = up.shape
+    best = np.zeros(H+1, dtype=int)
+    np.maximum.at(best, up.ravel(), spans.ravel())
+    widths = np.maximum.accumulate(best[::-1])[::-1]
+    widths[0] = W
+    return widths
+
+
+def get_integrals(boards):
+    # summed-area tables of ... * H * W bins, ... * (H+1) * (W+1)
+    S = np.zeros(boards.shape[:-2] + (boards.shape[-2]+1, boards.shape[-1]+1), dtype=np.int64)
+    np.cumsum(np.cumsum(boards, axis=-2), axis=-1, out=S[..., 1:, 1:])
+    return S
+
+
+def window_mask(S, w, h, i0, i1, j0, j1):
+    # valid placements of an item (h, w) at positions [i0, i1) * [j0, j1), read from
+    # summed-area tables S (... * (H+1) * (W+1)); see Bin.get_placement_window
+    free = (S[..., i0+h:i1+h, j0+w:j1+w] - S[..., i0:i1, j0+w:j1+w]
+            - S[..., i0+h:i1+h, j0:j1] + S[..., i0:i1, j0:j1]) == 0
+    up = np.ones_like(free)
+    u0 = max(i0, 1)
+    if i1 > u0:
+        up[..., u0-i0:, :] = (S[..., u0:i1, j0+w:j1+w] - S[..., u0-1:i1-1, j0+w:j1+w]
+                              - S[..., u0:i1, j0:j1] + S[..., u0-1:i1-1, j0:j1]) != 0
+    left = np.ones_like(free)
+    l0 = max(j0, 1)
+    if j1 > l0:
+        left[..., l0-j0:] = (S[..., i0+h:i1+h, l0:j1] - S[..., i0:i1, l0:j1]
+                             - S[..., i0+h:i1+h, l0-1:j1-1] + S[..., i0:i1, l0-1:j1-1]) != 0
+    return free & up & left
+
+
+def get_placement_masks(boards, widths, heights):
+    """Valid placements for many bins and items at once.
+
+    boards: K * H * W; widths, heights: K * N item sizes.
+    Returns a K * N * H * W boolean mask, the same as Bin.get_placement_mask per (bin, item).
+    Work is grouped by item shape, so each distinct (w, h) is one vectorized pass
+    over the bins holding an item of that shape.
+    """
+    K, H, W = boards.shape
+    N = widths.shape[1]
+    S = get_integrals(boards)
+    masks = np.zeros((K, N, H, W), dtype=bool)
+    if K == 0 or N == 0:
+        return masks
+    shapes, inverse = np.unique(heights*(widths.max()+1) + widths, return_inverse=True)
+    inverse = inverse.reshape(K, N)
+    for s in range(len(shapes)):
+        kk, nn = np.nonzero(inverse == s)
+        w, h = int(widths[kk[0], nn[0]]), int(heights[kk[0], nn[0]])
+        if h > H or w > W or h == 0 or w == 0:
+            continue
+        bins, idx = np.unique(kk, return_inverse=True)
+        mask = window_mask(S[bins], w, h, 0, H-h+1, 0, W-w+1)
+        masks[kk, nn, :H-h+1, :W-w+1] = mask[idx]
+    return masks
+
+
+def execute_moves(boards, rows, cols, widths, heights):
+    """Place one rectangle per bin in place; boards: K * H * W, the others: K.
+    A rectangle with zero width or height leaves its bin unchanged.
+    """
+    K, H, W = boards.shape
+    i = np.arange(H)[None, :, None]
+    j = np.arange(W)[None, None, :]
+    r, c = rows[:, None, None], cols[:, None, None]
+    rect = (i >= r) & (i < r + heights[:, None, None]) & (j >= c) & (j < c + widths[:, None, None])
+    boards[rect] = 1
+    return boards
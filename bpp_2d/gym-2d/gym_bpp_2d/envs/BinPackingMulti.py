@@ -0,0 +1,147 @@
+"""
+Packing items into several bins of the same size.
+"""
+import numpy as np
+
+from .BinPackingGame import BinPackingGame
+from .BinPackingHash import ZobristHash
+from .BinPackingLogic import MultiBin, get_free_widths
+
+class MultiBinPackingGame(BinPackingGame):
+    """BinPackingGame with n = num_bins bins.
+
+    The board is num_bins * H * W and an action is bin * (N*H*W) + the action of the
+    single-bin game in that bin; the full state is (num_bins+N) * H * W, the bins followed by
+    the item planes. The reward is (total area of items) / (sum over the bins in use of
+    max([w', h'])^2), the single-bin reward for one bin; 0 if an item is left out.
+    The functional interface (getNextState with hash keys, valid moves and items, termination,
+    reward, hashing, symmetries, evaluate) scans every bin; get_multi_bin() returns a MultiBin,
+    whose index finds the bins an item fits in without scanning them, for play with many bins.
+    The single-bin extras (corner and anchor moves, applyMove, heightmaps, tracked boxes and
+    the batched methods) are not available and raise NotImplementedError.
+    """
+
+    def __init__(self, bin_width, bin_height, num_items, num_bins, engine='sat'):
+        # one placement mask cache per bin is kept by MultiBin, the functional methods use plain bins
+        super().__init__(bin_width, bin_height, num_items, num_bins, engine=engine, mask_cache=False)
+        self.num_bins = num_bins
+        # Zobrist keys of the bins stacked along the height, bin b at rows b*H..(b+1)*H
+        self.zobrist = ZobristHash(bin_width, num_bins*bin_height, num_items)
+
+    def get_multi_bin(self):
+        return MultiBin(self.num_bins, self.bin_width, self.bin_height, self.engine)
+
+    def getInitBoard(self):
+        return np.zeros((self.num_bins, self.bin_height, self.bin_width), dtype=int)
+
+    def getBoardSize(self):
+        return (self.num_bins, self.bin_height, self.bin_width)
+
+    def getActionSize(self):
+        return self.num_bins * super().getActionSize()
+
+    def split_state(self, boards, items=None):
+        # (bins, compact items) from either a full state (B+N) * H * W or a (bins, items) pair
+        if items is None:
+            assert(len(boards) == self.num_items+self.num_bins)
+            return boards[:self.num_bins], self.getItemsFromBoard(boards[self.num_bins:])
+        if np.ndim(items) == 3:
+            items = self.getItemsFromBoard(items)
+        return boards, items
+
+    def getNextState(self, boards, action, items, key=None):
+        # key: hash of the state (stringRepresentation), updated in O(h*w) and returned as a third value
+        b, action = divmod(int(action), super().getActionSize())
+        board, next_items = super().getNextState(boards[b], action, items)
+        boards = np.copy(boards)
+        boards[b] = board
+        if key is not None:
+            cur_item, placement = divmod(action, self.bin_height*self.bin_width)
+            i, j = divmod(placement, self.bin_width)
+            w, h, _ = self.split_state(boards, items)[1][cur_item]
+            return (boards, next_items, self.zobrist.update(key, (b*self.bin_height + i, j), w, h, cur_item))
+        return (boards, next_items)
+
+    def get_valid_moves(self, boards, items=None, out=None):
+        boards, items = self.split_state(boards, items)
+        valids = [super(MultiBinPackingGame, self).get_valid_moves(board, items) for board in boards]
+        if out is None:
+            return np.concatenate(valids)
+        out[:] = np.concatenate(valids)
+        return out
+
+    def getValidItems(self, boards, items=None):
+        # binary vector of size N: 1 for items that can still be placed in some bin
+        # read from the widest free rectangle of each height, over the bins
+        boards, items = self.split_state(boards, items)
+        widths = np.max([get_free_widths(board) for board in boards], axis=0)
+        w, h, placed = items.T
+        fits = (h <= self.bin_height) & (widths[np.minimum(h, self.bin_height)] >= w)
+        return (fits & (placed == 0)).astype(int)
+
+    def getValidPositions(self, boards, items, item):
+        # binary vector of size B*H*W: 1 for the valid (bin, position) pairs of one item
+        boards, items = self.split_state(boards, items)
+        return np.concatenate([super(MultiBinPackingGame, self).getValidPositions(board, items, item)
+                               for board in boards])
+
+    def has_valid_moves(self, boards, items=None):
+        boards, items = self.split_state(boards, items)
+        return any(super(MultiBinPackingGame, self).has_valid_moves(board, items) for board in boards)
+
+    def getGameEnded(self, boards, items=None, valids=None):
+        if valids is not None:
+            return int(not valids.any())
+        return int(not self.has_valid_moves(boards, items))
+
+    def stringRepresentation(self, boards, items=None):
+        # Zobrist hash of the state (an int)
+        boards, items = self.split_state(boards, items)
+        return self.zobrist.hash(np.reshape(boards, (-1, self.bin_width)), items)
+
+    def getBinItem(self, boards, items):
+        # full state: the bins + items representation, (B+N) * H * W
+        if np.ndim(items) == 2:
+            items = self.getItemsBoard(items)
+        return np.concatenate([boards, items])
+
+    def getReward(self, boards, items_total_area):
+        # boards: the bins, B * H * W
+        if boards.sum() != items_total_area:
+            # some items are discarded instead of being placed in a bin
+            return 0
+        sizes = [self.get_minimal_bin(board) for board in boards if board.any()]
+        return items_total_area / sum(a*a for a in sizes)
+
+    def getCornerMoves(self, board, items, corners, num_corners):
+        raise NotImplementedError('corner points of one bin; see MultiBin.corners')
+
+    def getAnchorMoves(self, board, items, num_anchors):
+        raise NotImplementedError
+
+    def applyMove(self, board, action, items):
+        raise NotImplementedError('see MultiBin.execute_move')
+
+    def getHeightmap(self, board):
+        raise NotImplementedError
+
+    def getNextHeightmap(self, heights, action, items):
+        raise NotImplementedError
+
+    def getNextBox(self, box, action, items):
+        raise NotImplementedError
+
+    def getRewardFromBox(self, box, items_total_area):
+        raise NotImplementedError
+
+    def getValidMovesBatch(self, boards, items):
+        raise NotImplementedError
+
+    def getNextStateBatch(self, boards, actions, items):
+        raise NotImplementedError
+
+    def getBinItemBatch(self, boards, items):
+        raise NotImplementedError
+
+    def getRewardBatch(self, boards, items_total_area):
+        raise NotImplementedError
@@ -0,0 +1,76 @@
+"""
+Batched rollouts from one bin packing state, e.g. for the leaf values of MCTS.
+"""
+import time
+
+import numpy as np
+
+class RolloutEngine():
+    """Play M completions of a state in lockstep and return their final rewards.
+
+    All M bins are advanced together: the valid moves of the unfinished rollouts are
+    computed in one batched pass (getValidMovesBatch) and one action per rollout is picked
+    from its mask by the policy:
+      'random' - uniform among the valid moves
+      'bottom_left' - the first free position (row-major) where an item fits, the largest such item
+      'largest_first' - the largest item that fits, at its first position
+    A rollout ends when no item can be placed; its reward is getReward of its last bin.
+    """
+    POLICIES = ('random', 'bottom_left', 'largest_first')
+
+    def __init__(self, game, policy='random', seed=None):
+        assert policy in self.POLICIES
+        self.game = game
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        self.rollouts = 0
+        self.time = 0.
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def select(self, valids, items):
+        # one action per row of valids (K * action size), each a valid move
+        K = len(valids)
+        N, size_b = self.game.num_items, self.game.bin_height*self.game.bin_width
+        if self.policy == 'random':
+            # argmax of uniform noise restricted to the valid moves
+            return np.where(valids, self.rng.random(valids.shape), -1.).argmax(axis=1)
+        k = np.arange(K)
+        valids = valids.reshape(K, N, size_b)
+        area = items[:, :, 0] * items[:, :, 1]
+        if self.policy == 'bottom_left':
+            position = valids.any(axis=1).argmax(axis=1)
+            item = np.where(valids[k, :, position], area, -1).argmax(axis=1)
+        else:
+            item = np.where(valids.any(axis=2), area, -1).argmax(axis=1)
+            position = valids[k, item].argmax(axis=1)
+        return item*size_b + position
+
+    def rollout(self, board, items=None, num_rollouts=1):
+        # final rewards of num_rollouts completions of the state (full state, or bin and items)
+        start = time.perf_counter()
+        board, items = self.game.split_state(board, items)
+        items_total_area = int((items[:, 0] * items[:, 1]).sum())
+        boards = np.repeat(np.asarray(board)[None], num_rollouts, axis=0)
+        items = np.repeat(np.asarray(items)[None], num_rollouts, axis=0)
+
+        # unfinished rollouts; at most one item is placed per step
+        idx = np.arange(num_rollouts)
+        for _ in range(self.game.num_items + 1):
+            valids = self.game.getValidMovesBatch(boards[idx], items[idx])
+            alive = valids.any(axis=1)
+            idx, valids = idx[alive], valids[alive]
+            if not len(idx):
+                break
+            actions = self.select(valids, items[idx])
+            boards[idx], items[idx] = self.game.getNextStateBatch(boards[idx], actions, items[idx])
+
+        rewards = self.game.getRewardBatch(boards, np.full(num_rollouts, items_total_area))
+        self.rollouts += num_rollouts
+        self.time += time.perf_counter() - start
+        return rewards
+
+    def rollouts_per_sec(self):
+        # throughput over all rollouts played so far
+        return self.rollouts / self.time if self.time > 0 else 0.
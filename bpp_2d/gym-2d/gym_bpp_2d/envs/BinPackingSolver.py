@@ -0,0 +1,123 @@
+"""
+Non-learned baselines on the game: greedy bottom-left-fill / largest-area-first and beam search,
+solved for sets of instances in a process pool.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .BinPackingGame import BinPackingGame, ItemsGenerator
+from .BinPackingRollout import RolloutEngine
+
+METHODS = ('bottom_left', 'largest_first', 'beam')
+
+def get_scores(game, boards, items):
+    # beam ordering, lower is better: side of the minimal square bin of the packed
+    # bounding box, then the free area inside the box
+    rows = boards.any(axis=2)
+    cols = boards.any(axis=1)
+    h = np.where(rows.any(axis=1), game.bin_height - np.argmax(rows[:, ::-1], axis=1), 0)
+    w = np.where(cols.any(axis=1), game.bin_width - np.argmax(cols[:, ::-1], axis=1), 0)
+    placed = (items[:, :, 0] * items[:, :, 1] * items[:, :, 2]).sum(axis=1)
+    return np.maximum(h, w), h*w - placed
+
+def unique_states(boards, items):
+    # index of the first of each distinct state (same bin and placed items)
+    keys = np.concatenate([np.packbits(boards.reshape(len(boards), -1) != 0, axis=1),
+                           np.packbits(items[:, :, 2] != 0, axis=1)], axis=1)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    return np.sort(first)
+
+class Solver():
+    """Solve one instance (bin and compact items) of a BinPackingGame.
+
+    method:
+      'bottom_left' - greedy: the first free position (row-major) where an item fits, the largest such item
+      'largest_first' - greedy: the largest item that fits, at its first position
+      'beam' - beam search over placements: every move of every state of the beam is expanded
+               in one batched call (getValidMovesBatch / getNextStateBatch), duplicates are dropped
+               and the beam_width children with the smallest packed square bin (get_scores) are kept;
+               the bottom-left-fill solution is the initial incumbent, so the beam is never worse
+    solve returns the getReward score, the actions, the wall time and the expanded nodes.
+    """
+
+    def __init__(self, game, method='beam', beam_width=16):
+        assert method in METHODS
+        self.game = game
+        self.method = method
+        self.beam_width = beam_width
+
+    def solve(self, board, items):
+        start = time.perf_counter()
+        board, items = self.game.split_state(board, items)
+        items_total_area = self.game.getItemsArea(items)
+        if self.method == 'beam':
+            board, actions, nodes = self.beam_search(board, items)
+        else:
+            board, actions, nodes = self.greedy(board, items, self.method)
+        elapsed = time.perf_counter() - start
+        return {'reward': self.game.getReward(board, items_total_area), 'actions': actions,
+                'time': elapsed, 'nodes': nodes, 'nodes_per_sec': nodes / elapsed if elapsed > 0 else 0.}
+
+    def greedy(self, board, items, policy):
+        engine = RolloutEngine(self.game, policy)
+        actions = []
+        while True:
+            valids = self.game.get_valid_moves(board, items).astype(bool)
+            if not valids.any():
+                return board, actions, len(actions)
+            action = int(engine.select(valids[None], items[None])[0])
+            board, items = self.game.getNextState(board, action, items)
+            actions.append(action)
+
+    def beam_search(self, board, items):
+        game = self.game
+        boards, items = np.asarray(board)[None], np.asarray(items)[None]
+        paths = [[]]
+        items_total_area = game.getItemsArea(items[0])
+        # (reward, board, actions) of the best finished state; the scores of the beam don't
+        # follow the reward exactly, so the greedy solution may beat every state the beam finishes
+        greedy_board, greedy_actions, nodes = self.greedy(board, items[0], 'bottom_left')
+        best = (game.getReward(greedy_board, items_total_area), greedy_board, greedy_actions)
+        while len(boards):
+            valids = game.getValidMovesBatch(boards, items)
+            ended = ~valids.any(axis=1)
+            if ended.any():
+                rewards = game.getRewardBatch(boards[ended], np.full(ended.sum(), items_total_area))
+                k = int(rewards.argmax())
+                if rewards[k] > best[0]:
+                    e = np.flatnonzero(ended)[k]
+                    best = (rewards[k], boards[e], paths[e])
+            parents, actions = np.nonzero(valids)
+            if not len(parents):
+                break
+            children, child_items = game.getNextStateBatch(boards[parents], actions, items[parents])
+            nodes += len(parents)
+            keep = unique_states(children, child_items)
+            side, waste = get_scores(game, children[keep], child_items[keep])
+            keep = keep[np.lexsort((waste, side))[:self.beam_width]]
+            boards, items = children[keep], child_items[keep]
+            paths = [paths[parents[k]] + [int(actions[k])] for k in keep]
+        return best[1], best[2], nodes
+
+
+def solve_seed(args):
+    # solve the instance of one ItemsGenerator seed; args = (seed, method, beam_width, sizes)
+    seed, method, beam_width, (bin_height, bin_width, num_items, bin_height_virtual, bin_width_virtual) = args
+    game = BinPackingGame(bin_width_virtual, bin_height_virtual, num_items, n=1)
+    items = game.getInitItems(ItemsGenerator(bin_width, bin_height, num_items).items_generator(seed))
+    result = Solver(game, method, beam_width).solve(game.getInitBoard(), items)
+    result['seed'] = seed
+    return result
+
+def solve_seeds(seeds, method='beam', beam_width=16, bin_height=10, bin_width=10, num_items=10,
+                bin_height_virtual=15, bin_width_virtual=15, processes=None):
+    # solve the instances of BppEnv(bin_height, ..., seed=seed) for every seed, in a process pool;
+    # one result per seed, in order
+    sizes = (bin_height, bin_width, num_items, bin_height_virtual, bin_width_virtual)
+    tasks = [(seed, method, beam_width, sizes) for seed in seeds]
+    if processes == 1:
+        return [solve_seed(task) for task in tasks]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(solve_seed, tasks))
@@ -0,0 +1,68 @@
+"""
+Opt-in timers and counters for the phases of the step path (masks, transition, termination,
+observation, instance generation).
+"""
+import functools
+import json
+import time
+from collections import defaultdict
+
+class Profiler():
+    """Accumulated time per phase and event counters.
+
+    Objects with a profiler attribute (BppEnv, BinPackingGame) report to it from their
+    methods decorated with timed(phase); with profiler = None the decorator only adds
+    one attribute check per call.
+    export_path: if given, stats() is appended to this file (one JSON line) every
+    export_every steps (tick).
+    """
+
+    def __init__(self, export_path=None, export_every=1000):
+        self.export_path = export_path
+        self.export_every = export_every
+        self.reset()
+
+    def reset(self):
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.steps = 0
+
+    def add(self, phase, seconds):
+        self.times[phase] += seconds
+        self.calls[phase] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def tick(self):
+        # one environment step; exports periodically
+        self.steps += 1
+        if self.export_path is not None and self.export_every and self.steps % self.export_every == 0:
+            self.export()
+
+    def stats(self):
+        phases = {phase: {'calls': self.calls[phase], 'total_ms': self.times[phase] * 1e3,
+                          'mean_us': self.times[phase] / self.calls[phase] * 1e6}
+                  for phase in self.times}
+        return {'steps': self.steps, 'phases': phases, 'counters': dict(self.counters)}
+
+    def export(self, path=None):
+        with open(path or self.export_path, 'a') as f:
+            f.write(json.dumps(dict(self.stats(), time=time.time())) + '\n')
+
+
+def timed(phase):
+    # method decorator: time the call as phase if self.profiler is set
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if profiler is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            profiler.add(phase, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
@@ -1 +1,5 @@
 from gym_bpp_2d.envs.bpp_env import BppEnv
+from gym_bpp_2d.envs.bpp_vector_env import BppVectorEnv
+from gym_bpp_2d.envs.bpp_subproc_env import BppSubprocEnv
+from gym_bpp_2d.envs.bpp_multi_env import BppMultiEnv
+from gym_bpp_2d.envs.bpp_client_env import BppClientEnv
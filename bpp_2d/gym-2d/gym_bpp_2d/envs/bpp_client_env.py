@@ -0,0 +1,92 @@
+import json
+import socket
+
+import gym
+from gym import spaces
+import numpy as np
+
+from .BinPackingGame import BinPackingGame as Game
+from .bpp_env import get_seed
+from .bpp_server import REQUEST, SEED_WORD, CONFIG_HEADER, reply_size, parse_reply
+
+class BppClientEnv(gym.Env):
+    """BppEnv played on a BppServer (bpp_server.py) through its Unix domain socket.
+
+    Same interface as BppEnv with flat actions: reset(seed=...) with an int or a list of ints,
+    step(action) -> (obs, reward, done, info) with info['action_mask'], and valids. obs_mode:
+    'compact', 'packed' (the bin bit-packed along the rows, as sent by the server) or 'dense'.
+    """
+
+    def __init__(self, path, seed=[], obs_mode='compact'):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        size, = CONFIG_HEADER.unpack(self.recv(CONFIG_HEADER.size))
+        self.config = json.loads(self.recv(size))
+        self.reply_size = reply_size(self.config)
+        for key, value in self.config.items():
+            setattr(self, key, value)
+        assert obs_mode in ('dense', 'compact', 'packed')
+        self.obs_mode = obs_mode
+        H, W, N = self.bin_height_virtual, self.bin_width_virtual, self.num_items
+        self.game = Game(W, H, N, n=1)
+        self.action_space = spaces.Discrete(self.game.getActionSize())
+        items_space = spaces.Box(0, np.tile([self.bin_width, self.bin_height, 1], (N, 1)), (N, 3), dtype=int)
+        if obs_mode == 'dense':
+            self.observation_space = spaces.Box(0, 1, (N+1, H, W), dtype=int)
+        elif obs_mode == 'packed':
+            self.observation_space = spaces.Dict({'bin': spaces.Box(0, 255, (H, (W+7)//8), dtype=np.uint8),
+                                                  'items': items_space})
+        else:
+            self.observation_space = spaces.Dict({'bin': spaces.Box(0, 1, (H, W), dtype=int),
+                                                  'items': items_space})
+        self.reset(seed=get_seed(seed))
+
+    def recv(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('server closed the connection')
+            data += chunk
+        return bytes(data)
+
+    def request(self, command, arg=0, data=b''):
+        self.sock.sendall(REQUEST.pack(command, arg) + data)
+        reward, done, self.board, self.items, self.valids = parse_reply(self.recv(self.reply_size), self.config)
+        return reward, done
+
+    def get_obs(self):
+        if self.obs_mode == 'dense':
+            return self.game.getBinItem(self.board, self.items)
+        if self.obs_mode == 'packed':
+            return {'bin': self.game.getPackedBin(self.board), 'items': self.items}
+        return {'bin': self.board, 'items': self.items}
+
+    def get_info(self):
+        return {'action_mask': self.valids}
+
+    def get_valid_moves(self):
+        # valid moves of the current state, asked again from the server
+        self.request(b'm')
+        return self.valids
+
+    def reset(self, seed=None):
+        # seed: new seed of the instance (an int or a list of ints, as the seed of BppEnv),
+        # kept for the next resets
+        if seed is None:
+            self.request(b'r', -1)
+        elif np.ndim(get_seed(seed)) == 0:
+            self.request(b'r', int(get_seed(seed)))
+        else:
+            self.request(b'l', len(seed), b''.join(SEED_WORD.pack(int(w)) for w in seed))
+        return self.get_obs()
+
+    def step(self, action):
+        reward, done = self.request(b's', int(action))
+        return self.get_obs(), reward, done, self.get_info()
+
+    def close(self):
+        self.sock.close()
+
+    def render(self):
+        pass
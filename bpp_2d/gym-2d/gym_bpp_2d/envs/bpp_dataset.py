@@ -0,0 +1,128 @@
+import json
+import os
+
+import gym
+import numpy as np
+
+from .BinPackingGame import BinPackingGame as Game
+
+# one row per step; the observations are rebuilt by replaying the actions
+STEP_DTYPE = np.dtype([('episode', np.int32), ('action', np.int32), ('reward', np.float32), ('done', np.bool_)])
+
+def chunk_paths(path, c):
+    # (steps, items) files of chunk c of the dataset directory path
+    return (os.path.join(path, 'chunk_{:05d}_steps.npy'.format(c)),
+            os.path.join(path, 'chunk_{:05d}_items.npy'.format(c)))
+
+class TrajectoryRecorder(gym.Wrapper):
+    """Record the episodes of a BppEnv into a dataset directory.
+
+    Only the instance of each episode (its items, N * [w, h, x, y]) and the flat action,
+    reward and done of each step are stored; invalid actions are stored as -1.
+    Whole episodes are written in chunks of at least chunk_size steps, each chunk a pair of
+    .npy files (steps, items), so chunks can be memory-mapped and replayed independently
+    (TrajectoryReader). The instance is recorded by reset, so reset the env through the
+    recorder before its first step. Call close() to write the last chunk.
+    """
+
+    def __init__(self, env, path, chunk_size=10000):
+        super().__init__(env)
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        meta = {key: getattr(env, key) for key in ('bin_height', 'bin_width', 'num_items',
+                                                  'bin_height_virtual', 'bin_width_virtual')}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        self.num_chunks = 0
+        self.steps = []
+        self.items = []
+
+    def reset(self, *args, **kwargs):
+        obs = self.env.reset(*args, **kwargs)
+        if len(self.steps) >= self.chunk_size:
+            self.write_chunk()
+        self.items.append(self.env.items_list)
+        return obs
+
+    def step(self, action):
+        assert self.items, 'reset the recorder before the first step'
+        flat_action = self.env.decode_action(action)
+        obs, reward, done, info = self.env.step(action)
+        self.steps.append((len(self.items)-1, -1 if flat_action is None else flat_action, reward, done))
+        return obs, reward, done, info
+
+    def write_chunk(self):
+        # write the recorded episodes; called between episodes, so chunks hold whole episodes
+        if not self.steps:
+            return
+        steps_path, items_path = chunk_paths(self.path, self.num_chunks)
+        np.save(steps_path, np.array(self.steps, dtype=STEP_DTYPE))
+        np.save(items_path, np.array(self.items, dtype=np.int32))
+        self.num_chunks += 1
+        self.steps = []
+        self.items = []
+
+    def close(self):
+        self.write_chunk()
+        return self.env.close()
+
+
+class TrajectoryReader():
+    """Replay a dataset written by TrajectoryRecorder.
+
+    Iterating yields the transitions (obs, action, reward, next_obs, done) in recording
+    order, or chunk by chunk in random order with shuffle=True; observations are built
+    lazily through the game logic, as the observations of BppEnv (any of its obs_mode).
+    Chunks are memory-mapped, not loaded.
+    """
+
+    def __init__(self, path, obs_mode='dense', shuffle=False, seed=None):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        assert obs_mode in ('dense', 'compact', 'heightmap', 'packed')
+        self.obs_mode = obs_mode
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.num_chunks = 0
+        while os.path.exists(chunk_paths(path, self.num_chunks)[0]):
+            self.num_chunks += 1
+        self.game = Game(self.meta['bin_width_virtual'], self.meta['bin_height_virtual'], self.meta['num_items'], n=1)
+
+    def load_chunk(self, c):
+        return tuple(np.load(p, mmap_mode='r') for p in chunk_paths(self.path, c))
+
+    def __len__(self):
+        # number of steps
+        return sum(len(self.load_chunk(c)[0]) for c in range(self.num_chunks))
+
+    def get_obs(self, board, items):
+        if self.obs_mode == 'dense':
+            return self.game.getBinItem(board, items)
+        if self.obs_mode == 'heightmap':
+            return {'heights': self.game.getHeightmap(board), 'items': items}
+        if self.obs_mode == 'packed':
+            return {'bin': self.game.getPackedBin(board), 'items': items}
+        return {'bin': board, 'items': items}
+
+    def replay_chunk(self, c):
+        steps, items_lists = self.load_chunk(c)
+        episode = -1
+        for step in steps:
+            if step['episode'] != episode:
+                episode = step['episode']
+                board = self.game.getInitBoard()
+                items = self.game.getInitItems(np.asarray(items_lists[episode]).tolist())
+            obs = self.get_obs(board, items)
+            action = int(step['action'])
+            if action >= 0:
+                board, items = self.game.getNextState(board, action, items)
+            yield obs, action, float(step['reward']), self.get_obs(board, items), bool(step['done'])
+
+    def __iter__(self):
+        order = np.arange(self.num_chunks)
+        if self.shuffle:
+            self.rng.shuffle(order)
+        for c in order:
+            yield from self.replay_chunk(c)
@@ -1,12 +1,24 @@
 import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
+import numpy as np
 
 from .BinPackingGame import BinPackingGame as Game
 from .BinPackingGame import ItemsGenerator as Generator
+from .BinPackingGame import InstanceStore
+from .BinPackingLogic import CornerPoints
+from .BinPackingStats import Profiler, timed
+
+def get_seed(seed):
+    # seed: [] (or None) for the default seed 0, otherwise anything np.random.seed accepts
+    if seed is None or (np.ndim(seed) > 0 and len(seed) == 0):
+        return 0 # default seed
+    return seed
 
 class BppEnv(gym.Env):
-    def __init__(self, bin_height=10, bin_width=10, num_items=10, bin_height_virtual=15, bin_width_virtual=15, seed=[]):
+    def __init__(self, bin_height=10, bin_width=10, num_items=10, bin_height_virtual=15, bin_width_virtual=15, seed=[],
+                 obs_mode='dense', engine='sat', instance_store=None, action_mode='flat',
+                 num_corners=16, reward_mode='terminal', profiler=None, inplace=False, copy_obs=False):
         # init environment with default parameters
         # bin_height, bin_width: the 'optimal' bin size; generate items by slicing the bin (bin_height, bin_width)
         self.bin_height, self.bin_width = bin_height, bin_width
@@ -16,109 +28,373 @@ class BppEnv(gym.Env):
         # the size of this 'virtual' bin decides the size of the state representation
         self.bin_height_virtual, self.bin_width_virtual = bin_height_virtual, bin_width_virtual
         # set seed
-        if len(seed) == 0:
-            self.seed = 0 # default seed
-        else:
-            self.seed = seed
+        self.seed = get_seed(seed)
+        # observation:
+        #   'dense' - bin + one plane per item, (N+1) * virtual_height * virtual_width
+        #   'compact' - {'bin': virtual_height * virtual_width, 'items': N * (w, h, placed)}
+        #   'heightmap' - {'heights': virtual_width skyline of the bin (BinPackingGame.getHeightmap), 'items'}
+        #   'packed' - {'bin': virtual_height * ceil(virtual_width/8) bit-packed uint8 occupancy, 'items'}
+        assert obs_mode in ('dense', 'compact', 'heightmap', 'packed')
+        self.obs_mode = obs_mode
+        # action:
+        #   'flat' - one of N * virtual_height * virtual_width (item, position) pairs,
+        #            info['action_mask'] holds the valid ones
+        #   'factored' - [item, position]; info['item_mask'] (N) holds the items that can be placed,
+        #                get_position_mask(item) (virtual_height * virtual_width) the positions of one item
+        #   'corners' - item * num_corners + k: place an item with its top-left cell at the k-th corner point
+        #               (row-major) of the bin, self.candidates; info['action_mask'] holds the valid ones.
+        #               When no item fits at the first num_corners corner points, the candidates are the
+        #               first num_corners positions with a valid move instead (BinPackingGame.getAnchorMoves),
+        #               so the game ends as in the flat mode.
+        assert action_mode in ('flat', 'factored', 'corners')
+        self.action_mode = action_mode
+        self.num_corners = num_corners
+        # reward: 'terminal' (only at the end), 'bbox' (bounding box growth penalty + terminal)
+        # or 'density' (increase of the packing density); see BinPackingGame.getStepReward
+        assert reward_mode in ('terminal', 'bbox', 'density')
+        self.reward_mode = reward_mode
+        # placement engine of the game: 'sat' (array bin), 'bitboard' (rows as bitmasks) or 'loop' (reference)
+        self.engine = engine
+        # instances from an InstanceStore (or the path of its .npy file) instead of the generator;
+        # reset(index) draws instance index, reset() the next one
+        if isinstance(instance_store, str):
+            instance_store = InstanceStore(instance_store)
+        self.instance_store = instance_store
+        self.instance_index = 0
+        # per-phase timers and counters (BinPackingStats.Profiler, or True for a new one), see stats();
+        # None (default) disables them
+        if profiler is True:
+            profiler = Profiler()
+        self.profiler = profiler
+        # inplace: the state and observation buffers are allocated once and updated in place by
+        # reset and step; observations are then read-only views of them, overwritten by the next
+        # step/reset (copy_obs=True returns copies instead)
+        self.inplace = inplace
+        self.copy_obs = copy_obs
+        self.buffers = None
+        self.valids_view = None
 
         # initialize items by slicing a bin with size bin_height * bin_width
         self.gen = Generator(bin_width, bin_height, num_items)
-        # generate items using self.seed
-        items_list = self.gen.items_generator(self.seed)
-        self.items_list = items_list.copy()
-        # initialize bin packing problem as a game
-        self.game = Game(bin_width_virtual, bin_height_virtual, num_items, n=1)
-
-        # initial empty bin and items
-        # board = the virtual bin
-        board = self.game.getInitBoard()
-        self.board = board.copy()
-        items_list_board = self.game.getInitItems(self.items_list)
-        self.items_list_board = items_list_board.copy()
-        bin_items_state = self.game.getBinItem(board, items_list_board)
-        self.state = bin_items_state.copy()
-        # the total area of items
-        self.items_total_area = sum(sum(sum(items_list_board)))
+        self.items_cache = None
+        # initialize bin packing problem as a game, with empty bin and items generated using self.seed
+        self.game = None
+        self.init_game()
+        # the first reset plays the first instance of the store again
+        self.instance_index = 0
 
         # step
-        self.step = 0
+        self.current_step = 0
         self.max_step = 100
 
         # action space
         # action: choose an item from N items + choose a position for the item in the virtual bin
         # N * virtual_height * virtual_width
-        self.action_space = spaces.Discrete(self.game.getActionSize())
+        self.action_space = self.get_action_space()
+        self.observation_space = self.get_observation_space()
 
     def init_par(self, bin_height, bin_width, num_items, bin_height_virtual, bin_width_virtual, seed=[]):
         # to set parameters, use this the function
         self.bin_height, self.bin_width = bin_height, bin_width
         self.num_items = num_items
         self.bin_height_virtual, self.bin_width_virtual = bin_height_virtual, bin_width_virtual
-        if len(seed) == 0:
-            self.seed = 0 # default seed
-        else:
-            self.seed = seed
+        self.seed = get_seed(seed)
 
         # initialize items by slicing a bin with size bin_height * bin_width
         self.gen = Generator(bin_width, bin_height, num_items)
-
-        items_list = self.gen.items_generator(self.seed)
-        self.items_list = items_list.copy()
+        self.items_cache = None
         # initialize bin packing problem
-        self.game = Game(bin_width_virtual, bin_height_virtual, num_items, n=1)
+        self.game = None
+        self.buffers = None
+        self.valids_view = None
+        self.init_game()
+
+        # action space
+        self.action_space = self.get_action_space()
+        self.observation_space = self.get_observation_space()
+
+    @timed('generation')
+    def get_items_list(self, index=None):
+        if self.instance_store is None:
+            # generate items using self.seed; the last instance is kept, as resets with the same seed
+            # play it again
+            if self.items_cache is None or not np.array_equal(self.items_cache[0], self.seed):
+                self.items_cache = (self.seed, self.gen.items_generator(self.seed))
+            return self.items_cache[1]
+        # items of instance index of the store, the next one by default
+        if index is None:
+            index = self.instance_index
+        self.instance_index = (index + 1) % len(self.instance_store)
+        items_list = self.instance_store[index]
+        assert len(items_list) == self.num_items
+        return items_list
+
+    def init_game(self, index=None):
+        self.items_list = self.get_items_list(index).copy()
+        # initialize bin packing problem as a game (once, it only depends on the sizes)
+        if self.game is None:
+            self.game = Game(self.bin_width_virtual, self.bin_height_virtual, self.num_items, n=1, engine=self.engine)
+        self.game.profiler = self.profiler
 
         # initial empty bin and items
-        board = self.game.getInitBoard()
-        self.board = board.copy()
-        items_list_board = self.game.getInitItems(self.items_list)
-        self.items_list_board = items_list_board.copy()
-        bin_items_state = self.game.getBinItem(board, items_list_board)
-        self.state = bin_items_state.copy()
-        self.items_total_area = sum(sum(sum(items_list_board)))
+        # board = the virtual bin; items = N * (w, h, placed)
+        if self.inplace:
+            self.reset_buffers()
+        else:
+            self.board = self.game.getInitBoard()
+            self.items = self.game.getInitItems(self.items_list)
+            # skyline of the bin, updated in O(w) per move (heightmap observations only)
+            self.heights = self.game.getHeightmap(self.board) if self.obs_mode == 'heightmap' else None
+        # the total area of items
+        self.items_total_area = self.game.getItemsArea(self.items)
+        # packed bounding box and placed area (height, width, area), updated in O(1) per move
+        self.box = self.game.getInitBox()
+        if self.action_mode == 'corners':
+            self.corner_points = CornerPoints(self.bin_width_virtual, self.bin_height_virtual)
+            self.corner_points.reset(self.board)
+        self.update_masks()
 
-        # action space
-        self.action_space = spaces.Discrete(self.game.getActionSize())
+    def alloc_buffers(self):
+        # state and observation buffers of the inplace mode
+        H, W, N = self.bin_height_virtual, self.bin_width_virtual, self.num_items
+        self.board = np.zeros((H, W), dtype=int)
+        self.items = np.zeros((N, 3), dtype=int)
+        self.heights = np.zeros(W, dtype=int) if self.obs_mode == 'heightmap' else None
+        if self.action_mode == 'flat':
+            self.valids = np.zeros(N*H*W, dtype=int)
+        # writable observation buffers (the bin and items themselves where possible)
+        if self.obs_mode == 'dense':
+            self.buffers = np.zeros((N+1, H, W), dtype=int)
+        elif self.obs_mode == 'heightmap':
+            self.buffers = {'heights': self.heights, 'items': self.items}
+        elif self.obs_mode == 'packed':
+            self.buffers = {'bin': np.zeros((H, (W+7)//8), dtype=np.uint8), 'items': self.items}
+        else:
+            self.buffers = {'bin': self.board, 'items': self.items}
+        # and their read-only views, returned as observations
+        if isinstance(self.buffers, dict):
+            self.views = {key: self.read_only(a) for key, a in self.buffers.items()}
+        else:
+            self.views = self.read_only(self.buffers)
+        self.valids_view = self.read_only(self.valids) if self.action_mode == 'flat' else None
+
+    @staticmethod
+    def read_only(a):
+        view = a.view()
+        view.setflags(write=False)
+        return view
+
+    def reset_buffers(self):
+        # inplace mode: empty bin and the items of self.items_list, without new arrays
+        if self.buffers is None:
+            self.alloc_buffers()
+        self.board.fill(0)
+        for n, (w, h, _, _) in enumerate(self.items_list):
+            self.items[n] = (w, h, 0)
+        if self.heights is not None:
+            self.heights.fill(0)
+        self.sync_buffers()
 
+    def sync_buffers(self):
+        # inplace mode: observation buffers of the current bin and items
+        if self.obs_mode == 'dense':
+            self.buffers[0] = self.board
+            self.buffers[1:] = 0
+            for n, (w, h, placed) in enumerate(self.items):
+                if not placed:
+                    self.buffers[1+n, :h, :w] = 1
+        elif self.obs_mode == 'packed':
+            self.buffers['bin'][:] = self.game.getPackedBin(self.board)
+
+    def apply_move(self, action):
+        # inplace mode: the transition of step on the state and observation buffers
+        item, (i, j), w, h = self.game.applyMove(self.board, action, self.items)
+        if self.heights is not None:
+            np.maximum(self.heights[j:j+w], i+h, out=self.heights[j:j+w])
+        if self.obs_mode == 'dense':
+            self.buffers[0, i:i+h, j:j+w] = 1
+            self.buffers[1+item, :h, :w] = 0
+        elif self.obs_mode == 'packed':
+            self.buffers['bin'][i:i+h] = self.game.getPackedBin(self.board[i:i+h])
+
+    def update_masks(self):
+        # masks of the current state; computed once per transition, they decide termination,
+        # are returned in info and validate the next action
+        if self.action_mode == 'flat':
+            # valid moves, N * virtual_height * virtual_width (into the valids buffer in inplace mode)
+            self.valids = self.game.get_valid_moves(self.board, self.items, self.valids if self.inplace else None)
+        elif self.action_mode == 'factored':
+            # items that can be placed, N; the positions are only computed for the chosen item
+            self.valids = self.game.getValidItems(self.board, self.items)
+        else:
+            # valid (item, corner point) pairs, N * num_corners
+            self.candidates = self.corner_points.get(self.num_corners)
+            self.valids = self.game.getCornerMoves(self.board, self.items, self.candidates, self.num_corners)
+            if not self.valids.any():
+                self.candidates, self.valids = self.game.getAnchorMoves(self.board, self.items, self.num_corners)
+        if self.profiler is not None:
+            self.profiler.count('candidates_scanned', self.count_candidates())
+
+    def count_candidates(self):
+        # (item, position) pairs tested by the masks of the current state
+        w, h, placed = self.items.T
+        if self.action_mode == 'corners':
+            return (placed == 0).sum() * len(self.candidates)
+        if self.action_mode == 'factored':
+            # one lookup per item in the free widths of the bin
+            return (placed == 0).sum()
+        positions = np.maximum(self.bin_height_virtual-h+1, 0) * np.maximum(self.bin_width_virtual-w+1, 0)
+        return positions[placed == 0].sum()
+
+    def get_info(self):
+        if self.action_mode == 'factored':
+            return {'item_mask': self.valids}
+        if self.valids_view is not None:
+            return {'action_mask': self.valids_view}
+        return {'action_mask': self.valids}
+
+    def get_position_mask(self, item):
+        # factored actions: valid positions of item in the current state, virtual_height * virtual_width
+        return self.game.getValidPositions(self.board, self.items, item)
+
+    def get_action_space(self):
+        H, W, N = self.bin_height_virtual, self.bin_width_virtual, self.num_items
+        if self.action_mode == 'flat':
+            return spaces.Discrete(self.game.getActionSize())
+        if self.action_mode == 'corners':
+            return spaces.Discrete(N*self.num_corners)
+        return spaces.MultiDiscrete([N, H*W])
+
+    def decode_action(self, action):
+        # the flat action of a valid action, None for an invalid one
+        if self.action_mode == 'flat':
+            return action if self.valids[action] == 1 else None
+        if self.action_mode == 'corners':
+            if self.valids[action] != 1:
+                return None
+            item, k = divmod(int(action), self.num_corners)
+            i, j = self.candidates[k]
+            return item*self.bin_height_virtual*self.bin_width_virtual + i*self.bin_width_virtual + j
+        item, position = int(action[0]), int(action[1])
+        if self.valids[item] != 1 or self.get_position_mask(item)[position] != 1:
+            return None
+        return item*self.bin_height_virtual*self.bin_width_virtual + position
+
+    def get_observation_space(self):
+        H, W, N = self.bin_height_virtual, self.bin_width_virtual, self.num_items
+        if self.obs_mode == 'dense':
+            return spaces.Box(0, 1, (N+1, H, W), dtype=int)
+        items_high = np.tile([self.bin_width, self.bin_height, 1], (N, 1))
+        items_space = spaces.Box(0, items_high, (N, 3), dtype=int)
+        if self.obs_mode == 'heightmap':
+            return spaces.Dict({'heights': spaces.Box(0, H, (W,), dtype=int), 'items': items_space})
+        if self.obs_mode == 'packed':
+            return spaces.Dict({'bin': spaces.Box(0, 255, (H, (W+7)//8), dtype=np.uint8), 'items': items_space})
+        return spaces.Dict({'bin': spaces.Box(0, 1, (H, W), dtype=int), 'items': items_space})
+
+    @timed('observation')
+    def get_obs(self):
+        # build the observation from the bin and the compact items
+        if self.inplace:
+            # views of the buffers (or copies with copy_obs)
+            if isinstance(self.views, dict):
+                return {key: a.copy() if self.copy_obs else a for key, a in self.views.items()}
+            return self.views.copy() if self.copy_obs else self.views
+        if self.obs_mode == 'dense':
+            obs = self.game.getBinItem(self.board, self.items)
+        elif self.obs_mode == 'heightmap':
+            obs = {'heights': self.heights.copy(), 'items': self.items.copy()}
+        elif self.obs_mode == 'packed':
+            obs = {'bin': self.game.getPackedBin(self.board), 'items': self.items.copy()}
+        else:
+            obs = {'bin': self.board.copy(), 'items': self.items.copy()}
+        if self.profiler is not None:
+            self.profiler.count('obs_bytes', sum(a.nbytes for a in obs.values()) if isinstance(obs, dict) else obs.nbytes)
+        return obs
+
+    def stats(self):
+        # timers and counters of the profiler, and the hit rates of the placement mask cache
+        stats = self.profiler.stats() if self.profiler is not None else {}
+        stats['mask_cache'] = self.game.getMaskCacheStats()
+        return stats
 
     def step(self, action):
-        self.step += 1
-        exceed_max_step = self.step > self.max_step
+        self.current_step += 1
+        exceed_max_step = self.current_step > self.max_step
+
+        if self.profiler is not None:
+            self.profiler.tick()
+        action = self.decode_action(action)
+        if action is None:
+            if self.profiler is not None:
+                self.profiler.count('invalid_actions')
+            return self.get_obs(), 0, 0 or exceed_max_step, self.get_info()
 
-        valid_actions = self.game.getValidMoves(self.state)
-        if valid_actions[action] != 1:
-            return self.state.copy(), 0, 0 or exceed_max_step, []
+        prev_box = self.box
+        self.box = self.game.getNextBox(self.box, action, self.items)
+        if self.inplace:
+            self.apply_move(action)
+        else:
+            if self.heights is not None:
+                self.heights = self.game.getNextHeightmap(self.heights, action, self.items)
+            self.board, self.items = self.game.getNextState(self.board, action, self.items)
+        if self.action_mode == 'corners':
+            item, position = divmod(action, self.bin_height_virtual*self.bin_width_virtual)
+            w, h, _ = self.items[item]
+            self.corner_points.update(self.board, divmod(position, self.bin_width_virtual), w, h)
+        self.update_masks()
 
-        board, items_list_board = self.game.getNextState(self.board, action, self.items_list_board)
-        self.board = board.copy()
-        self.items_list_board = items_list_board.copy()
-        next_bin_items_state = self.game.getBinItem(board, items_list_board)
-        self.state = next_bin_items_state.copy()
+        done = self.game.getGameEnded(self.board, self.items, self.valids)
+        r = self.game.getStepReward(prev_box, self.box, self.items_total_area, done, self.reward_mode)
 
+        return self.get_obs(), r, done or exceed_max_step, self.get_info()
 
-        done = self.game.getGameEnded(next_bin_items_state)
-        if not done:
-            r = 0
+    def snapshot(self):
+        # opaque token of the current state, for restore; O(1), nothing is copied:
+        # the bin, items and masks are never modified in place (each move builds new ones),
+        # they are only marked read-only so that sharing them stays safe.
+        # This includes the arrays already returned to the caller (e.g. info['action_mask']):
+        # editing them in place after a snapshot raises ValueError, copy them first.
+        # The inplace mode updates its buffers in place, so they are copied.
+        state = (self.board, self.items, self.valids, self.heights)
+        if self.inplace:
+            state = tuple(None if a is None else a.copy() for a in state)
         else:
-            r = self.game.getReward(next_bin_items_state, self.items_total_area)
+            for a in state[:3]:
+                a.setflags(write=False)
+        corners = None
+        if self.action_mode == 'corners':
+            corners = (self.corner_points.points, self.candidates)
+        return (state, self.current_step, self.box, corners, self.items_list, self.items_total_area)
 
-        return self.state.copy(), r, done or exceed_max_step, []
+    def restore(self, token):
+        # go back to the state of a snapshot; returns its observation
+        state, self.current_step, self.box, corners, self.items_list, self.items_total_area = token
+        if self.inplace:
+            board, items, valids, heights = state
+            self.board[:], self.items[:] = board, items
+            if heights is not None:
+                self.heights[:] = heights
+            if self.action_mode == 'flat':
+                self.valids[:] = valids
+            else:
+                self.valids = valids.copy()
+            self.sync_buffers()
+        else:
+            self.board, self.items, self.valids, self.heights = state
+        if corners is not None:
+            self.corner_points.points, self.candidates = corners
+        return self.get_obs()
 
-    def reset(self):
-        items_list = self.gen.items_generator(self.seed)
-        self.items_list = items_list.copy()
+    def reset(self, index=None, seed=None):
         # initialize bin packing problem
-        self.game = Game(self.bin_width_virtual, self.bin_height_virtual, self.num_items, n=1)
-
-        # initial empty bin and items
-        board = self.game.getInitBoard()
-        self.board = board.copy()
-        items_list_board = self.game.getInitItems(self.items_list)
-        self.items_list_board = items_list_board.copy()
-        bin_items_state = self.game.getBinItem(board, items_list_board)
-        self.state = bin_items_state.copy()
-        self.items_total_area = sum(sum(sum(items_list_board)))
-        self.step = 0
-        return self.state
+        # index: instance of the instance store to play (next instance by default)
+        # seed: new seed of the items generator (as the seed of __init__), kept for the next resets
+        if seed is not None:
+            self.seed = get_seed(seed)
+        self.init_game(index)
+        self.current_step = 0
+        return self.get_obs()
 
     def render(self):
         pass
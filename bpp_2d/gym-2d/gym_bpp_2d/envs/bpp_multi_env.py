@@ -0,0 +1,107 @@
+import gym
+from gym import spaces
+import numpy as np
+
+from .BinPackingGame import ItemsGenerator as Generator
+from .BinPackingMulti import MultiBinPackingGame
+from .bpp_env import get_seed
+
+class BppMultiEnv(gym.Env):
+    """Pack the items of item_bins bins into num_bins bins.
+
+    Each instance is item_bins bins (bin_height * bin_width) sliced into num_items items
+    each, shuffled together, so a perfect packing fills item_bins bins; by default
+    item_bins = 2/3 of num_bins (as the 10 vs 15 of BppEnv), which leaves room for imperfect
+    packings. An action chooses one of the N = item_bins * num_items items; it is placed by
+    the placement rule:
+      'first_fit' - in the first bin it fits in
+      'best_fit' - in the fullest bin it fits in
+    at the first corner point of that bin where it fits (MultiBin.get_position).
+    info['action_mask'] holds the items that fit in some bin. Bins are looked up through
+    the free-space index of MultiBin, so a step does not scan the other bins.
+    Observation: {'bins': num_bins * bin_height * bin_width, 'items': N * (w, h, placed)};
+    'bins' is a read-only view, overwritten by the next step/reset.
+    Reward: MultiBinPackingGame.getReward at the end of the game, 0 before.
+    """
+
+    def __init__(self, bin_height=10, bin_width=10, num_items=10, num_bins=4, item_bins=None, seed=[],
+                 placement='first_fit', engine='sat'):
+        self.bin_height, self.bin_width = bin_height, bin_width
+        self.num_bins = num_bins
+        # bins sliced into items, items per sliced bin, and in total
+        self.item_bins = item_bins if item_bins is not None else max(1, num_bins * 2 // 3)
+        self.num_items = num_items
+        self.num_items_total = self.item_bins * num_items
+        self.seed = get_seed(seed)
+        assert placement in ('first_fit', 'best_fit')
+        self.placement = placement
+
+        self.gen = Generator(bin_width, bin_height, num_items)
+        self.game = MultiBinPackingGame(bin_width, bin_height, self.num_items_total, num_bins, engine=engine)
+        self.bins = self.game.get_multi_bin()
+        self.bins_view = self.bins.pieces.view()
+        self.bins_view.setflags(write=False)
+        self.init_game()
+
+        self.current_step = 0
+        self.max_step = 100 * num_bins
+
+        N = self.num_items_total
+        self.action_space = spaces.Discrete(N)
+        items_high = np.tile([bin_width, bin_height, 1], (N, 1))
+        self.observation_space = spaces.Dict({
+            'bins': spaces.Box(0, 1, (num_bins, bin_height, bin_width), dtype=int),
+            'items': spaces.Box(0, items_high, (N, 3), dtype=int)})
+
+    def init_game(self):
+        # item_bins sliced bins of the seed, items shuffled
+        rng = np.random.default_rng(self.seed)
+        items_list = self.gen.generate(self.item_bins, rng).reshape(-1, 4)
+        self.items_list = items_list[rng.permutation(len(items_list))].tolist()
+        self.items = self.game.getInitItems(self.items_list)
+        self.items_total_area = self.game.getItemsArea(self.items)
+        self.bins.reset()
+        self.update_masks()
+
+    def update_masks(self):
+        # items that can be placed: not placed yet and the widest free rectangle of their height
+        # in some bin is wide enough
+        widest = self.bins.free_widths.max(axis=0)
+        w, h, placed = self.items.T
+        self.valids = ((placed == 0) & (widest[h] >= w)).astype(int)
+
+    def get_obs(self):
+        return {'bins': self.bins_view, 'items': self.items.copy()}
+
+    def get_info(self):
+        return {'action_mask': self.valids}
+
+    def step(self, action):
+        self.current_step += 1
+        exceed_max_step = self.current_step > self.max_step
+        if self.valids[action] != 1:
+            return self.get_obs(), 0, 0 or exceed_max_step, self.get_info()
+
+        w, h, _ = (int(x) for x in self.items[action])
+        if self.placement == 'first_fit':
+            b, move = self.bins.first_fit(w, h)
+        else:
+            b, move = self.bins.best_fit(w, h)
+        self.bins.execute_move(b, move, w, h)
+        self.items[action, 2] = 1
+        self.update_masks()
+
+        done = int(not self.valids.any())
+        r = self.game.getReward(self.bins.pieces, self.items_total_area) if done else 0
+        return self.get_obs(), r, done or exceed_max_step, self.get_info()
+
+    def reset(self, seed=None):
+        # seed: new seed of the instance, kept for the next resets
+        if seed is not None:
+            self.seed = get_seed(seed)
+        self.init_game()
+        self.current_step = 0
+        return self.get_obs()
+
+    def render(self):
+        pass
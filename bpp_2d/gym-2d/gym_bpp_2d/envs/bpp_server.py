@@ -0,0 +1,229 @@
+"""
+Local env server: one process hosts the games of many clients over a Unix domain socket
+and steps the concurrent requests together with the batched game methods.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+from .BinPackingGame import BinPackingGame as Game
+from .BinPackingGame import ItemsGenerator as Generator
+
+# request: command (b'r' reset, b'l' reset with a list seed, b's' step, b'm' masks of the current state)
+# and its argument (the seed for reset, -1 to keep the last one; the length of the seed for b'l',
+# whose int64 words follow; the action for step)
+REQUEST = struct.Struct('<cq')
+SEED_WORD = struct.Struct('<q')
+# longest list seed accepted
+MAX_SEED_WORDS = 64
+# reply: reward, done, then the bit-packed bin (H * ceil(W/8)), the items (N * 3 int16)
+# and the bit-packed valid moves (ceil(A/8))
+REPLY_HEADER = struct.Struct('<dB')
+# length prefix of the configuration sent on connection
+CONFIG_HEADER = struct.Struct('<I')
+
+logger = logging.getLogger(__name__)
+
+def reply_size(config):
+    H, W, N = config['bin_height_virtual'], config['bin_width_virtual'], config['num_items']
+    return REPLY_HEADER.size + H*((W+7)//8) + N*3*2 + (N*H*W+7)//8
+
+def parse_reply(data, config):
+    # (reward, done, bin, items, valids) of a reply
+    H, W, N = config['bin_height_virtual'], config['bin_width_virtual'], config['num_items']
+    reward, done = REPLY_HEADER.unpack_from(data)
+    offset = REPLY_HEADER.size
+    packed = np.frombuffer(data, dtype=np.uint8, count=H*((W+7)//8), offset=offset)
+    offset += packed.nbytes
+    board = np.unpackbits(packed.reshape(H, -1), axis=-1, count=W).astype(int)
+    items = np.frombuffer(data, dtype=np.int16, count=N*3, offset=offset).reshape(N, 3).astype(int)
+    offset += N*3*2
+    valids = np.unpackbits(np.frombuffer(data, dtype=np.uint8, offset=offset), count=N*H*W).astype(int)
+    return reward, bool(done), board, items, valids
+
+
+class BppServer():
+    """Games of up to max_sessions clients, one session per connection.
+
+    A session behaves like BppEnv(bin_height, ..., seed) with flat actions: reset(seed) (an int
+    or a list of ints),
+    step(action) with the terminal reward and max_step, invalid actions leave the state
+    unchanged. Requests that arrive together (at most max_batch, gathered for batch_wait
+    seconds after the first one) are served with one getNextStateBatch and one
+    getValidMovesBatch call. Instances are generated once per seed and shared by the sessions.
+    """
+
+    def __init__(self, path, bin_height=10, bin_width=10, num_items=10, bin_height_virtual=15,
+                 bin_width_virtual=15, max_sessions=256, max_batch=64, batch_wait=0.):
+        self.path = path
+        self.config = dict(bin_height=bin_height, bin_width=bin_width, num_items=num_items,
+                           bin_height_virtual=bin_height_virtual, bin_width_virtual=bin_width_virtual)
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.max_step = 100
+        self.gen = Generator(bin_width, bin_height, num_items)
+        self.game = Game(bin_width_virtual, bin_height_virtual, num_items, n=1)
+        # seed -> initial items
+        self.instances = {}
+
+        # state of the sessions, by slot
+        H, W, N = bin_height_virtual, bin_width_virtual, num_items
+        self.boards = np.zeros((max_sessions, H, W), dtype=int)
+        self.items = np.zeros((max_sessions, N, 3), dtype=int)
+        self.valids = np.zeros((max_sessions, self.game.getActionSize()), dtype=bool)
+        self.steps = np.zeros(max_sessions, dtype=int)
+        # seed of each session, an int or a tuple of ints
+        self.seeds = [0] * max_sessions
+        self.items_total_area = np.zeros(max_sessions, dtype=int)
+        self.free_slots = list(range(max_sessions))[::-1]
+        self.queue = None
+        # served requests and batches
+        self.requests = 0
+        self.batches = 0
+
+    def get_instance(self, seed):
+        # seed: an int or a tuple of ints, as the seed of BppEnv
+        if seed not in self.instances:
+            self.instances[seed] = self.game.getInitItems(self.gen.items_generator(seed))
+        return self.instances[seed]
+
+    def reset_session(self, slot, seed, future):
+        # seed: an int (-1 to keep the last one) or a tuple of ints
+        # returns False, with the request failed, if there is no instance for the seed;
+        # the session then keeps its state and the other requests of the batch are served
+        if not isinstance(seed, tuple) and seed < 0:
+            seed = self.seeds[slot]
+        try:
+            items = self.get_instance(seed)
+        except Exception as e:
+            future.set_exception(e)
+            return False
+        self.seeds[slot] = seed
+        self.boards[slot] = 0
+        self.items[slot] = items
+        self.items_total_area[slot] = self.game.getItemsArea(items)
+        self.steps[slot] = 0
+        return True
+
+    def process(self, batch):
+        # serve a batch of requests (slot, command, argument, future); one request per slot
+        # the argument of a reset is the seed; resets are applied first and the failed ones
+        # are left out of the batch
+        batch = [(slot, command, arg, future) for slot, command, arg, future in batch
+                 if command != b'r' or self.reset_session(slot, arg, future)]
+        if not batch:
+            return
+        slots = np.array([request[0] for request in batch])
+        commands = [request[1] for request in batch]
+        args = np.array([request[2] if request[1] == b's' else 0 for request in batch])
+        is_reset = np.array([c == b'r' for c in commands])
+        is_step = np.array([c == b's' for c in commands])
+        rewards = np.zeros(len(batch))
+        dones = np.zeros(len(batch), dtype=bool)
+
+        step = np.flatnonzero(is_step)
+        self.steps[slots[step]] += 1
+        dones[step] = self.steps[slots[step]] > self.max_step
+        # invalid actions leave their session unchanged
+        in_range = (args[step] >= 0) & (args[step] < self.valids.shape[1])
+        step_in = step[in_range]
+        moved = step_in[self.valids[slots[step_in], args[step_in]]]
+        s, actions = slots[moved], args[moved]
+        if len(moved):
+            self.boards[s], self.items[s] = self.game.getNextStateBatch(self.boards[s], actions, self.items[s])
+
+        # masks of the states that changed, in one batched call
+        changed = np.concatenate([slots[is_reset], s])
+        if len(changed):
+            self.valids[changed] = self.game.getValidMovesBatch(self.boards[changed], self.items[changed])
+        ended = ~self.valids[s].any(axis=1)
+        end = moved[ended]
+        rewards[end] = self.game.getRewardBatch(self.boards[slots[end]], self.items_total_area[slots[end]])
+        dones[moved] |= ended
+
+        # compact replies: bit-packed bins and masks, int16 items
+        bins = np.packbits(self.boards[slots] != 0, axis=-1)
+        items = self.items[slots].astype(np.int16)
+        masks = np.packbits(self.valids[slots], axis=-1)
+        for k, request in enumerate(batch):
+            reply = REPLY_HEADER.pack(rewards[k], int(dones[k])) + bins[k].tobytes() + items[k].tobytes() + masks[k].tobytes()
+            request[3].set_result(reply)
+        self.requests += len(batch)
+        self.batches += 1
+
+    async def batcher(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_wait > 0:
+                await asyncio.sleep(self.batch_wait)
+            else:
+                # let the other clients with a request ready queue it
+                await asyncio.sleep(0)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                self.process(batch)
+            except Exception as e:
+                # unexpected errors fail the requests of the batch (their connections are closed),
+                # keep serving
+                for request in batch:
+                    if not request[3].done():
+                        request[3].set_exception(e)
+
+    async def handle(self, reader, writer):
+        # one session per connection
+        if not self.free_slots:
+            writer.close()
+            return
+        slot = self.free_slots.pop()
+        loop = asyncio.get_running_loop()
+        config = json.dumps(self.config).encode()
+        writer.write(CONFIG_HEADER.pack(len(config)) + config)
+        try:
+            while True:
+                command, arg = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                if command == b'l':
+                    # reset with a list seed, its words follow the request
+                    if not 0 <= arg <= MAX_SEED_WORDS:
+                        raise ValueError('seed of {} words'.format(arg))
+                    words = await reader.readexactly(arg * SEED_WORD.size)
+                    command, arg = b'r', tuple(w for w, in SEED_WORD.iter_unpack(words))
+                    if any(w < 0 for w in arg):
+                        raise ValueError('negative seed word in {}'.format(arg))
+                future = loop.create_future()
+                await self.queue.put((slot, command, arg, future))
+                writer.write(await future)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception('session closed after an error')
+        finally:
+            self.free_slots.append(slot)
+            writer.close()
+
+    async def run(self):
+        self.queue = asyncio.Queue()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        batcher = asyncio.ensure_future(self.batcher())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches,
+                'mean_batch': self.requests / self.batches if self.batches else 0,
+                'instances': len(self.instances)}
+
+
+def serve(path, **kwargs):
+    # run a BppServer until interrupted
+    asyncio.run(BppServer(path, **kwargs).run())
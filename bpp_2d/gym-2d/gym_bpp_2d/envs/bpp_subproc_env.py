@@ -0,0 +1,218 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+from gym import spaces
+
+from .bpp_env import get_seed
+from .bpp_vector_env import BppVectorEnv
+
+def get_env_seeds(seed, num_envs):
+    # one seed per environment derived from seed (as the seed of BppEnv);
+    # the seeds do not depend on how the environments are sharded over workers
+    children = np.random.SeedSequence(get_seed(seed)).spawn(num_envs)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+def attach_buffers(layout, names):
+    # numpy views of the shared memory blocks; layout: name -> (shape, dtype)
+    blocks, arrays = {}, {}
+    for key, (shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=names[key])
+        blocks[key] = block
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+def worker(pipe, parent_pipe, layout, names, start, end, env_kwargs):
+    # host the environments [start, end) as one BppVectorEnv; exchange data through shared memory
+    parent_pipe.close()
+    # the parent owns the blocks and unlinks them on close
+    blocks, arrays = attach_buffers(layout, names)
+    venv = BppVectorEnv(end - start, **env_kwargs)
+
+    def write_obs(obs, prefix):
+        if isinstance(obs, dict):
+            for key, value in obs.items():
+                arrays[prefix+'_'+key][start:end] = value
+        else:
+            arrays[prefix][start:end] = obs
+
+    try:
+        while True:
+            cmd = pipe.recv()
+            if cmd == 'reset':
+                write_obs(venv.reset(), 'obs')
+                arrays['action_mask'][start:end] = venv.valids
+            elif cmd == 'step':
+                obs, rewards, dones, info = venv.step(arrays['actions'][start:end])
+                write_obs(obs, 'obs')
+                write_obs(info.get('final_observation', obs), 'final_obs')
+                arrays['rewards'][start:end] = rewards
+                arrays['dones'][start:end] = dones
+                arrays['action_mask'][start:end] = info['action_mask']
+            elif cmd == 'close':
+                break
+            pipe.send(None)
+    except Exception as e:
+        pipe.send(e)
+    finally:
+        del arrays
+        for block in blocks.values():
+            block.close()
+        pipe.close()
+
+class BppSubprocEnv():
+    """Environments sharded over worker processes, each running one BppVectorEnv.
+
+    Observations, rewards, dones and action masks are written by the workers into
+    shared memory and returned to the caller as views of it (no copy, no pickling);
+    they are overwritten by the next step/reset, copy them to keep them.
+    seed: as the seed of BppEnv; environment k gets a seed derived from it.
+    """
+
+    def __init__(self, num_envs, num_workers=None, seed=[], bin_height=10, bin_width=10, num_items=10,
+                 bin_height_virtual=15, bin_width_virtual=15, obs_mode='dense', context=None):
+        self.num_envs = num_envs
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = max(1, min(num_workers, num_envs))
+        self.seeds = get_env_seeds(seed, num_envs)
+        N, H, W = num_items, bin_height_virtual, bin_width_virtual
+        A = N * H * W
+        self.single_action_space = spaces.Discrete(A)
+        self.action_space = spaces.MultiDiscrete([A]*num_envs)
+        self.obs_mode = obs_mode
+
+        # shared memory layout, name -> (shape, dtype)
+        obs_layout = {'': (num_envs, N+1, H, W)} if obs_mode == 'dense' else \
+            {'_bin': (num_envs, H, W), '_items': (num_envs, N, 3)}
+        layout = {}
+        for prefix in ('obs', 'final_obs'):
+            for key, shape in obs_layout.items():
+                layout[prefix+key] = (shape, np.int64)
+        layout['actions'] = ((num_envs,), np.int64)
+        layout['rewards'] = ((num_envs,), np.float64)
+        layout['dones'] = ((num_envs,), np.bool_)
+        layout['action_mask'] = ((num_envs, A), np.bool_)
+        self.layout = layout
+        self.blocks = {}
+        for key, (shape, dtype) in layout.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            self.blocks[key] = shared_memory.SharedMemory(create=True, size=size)
+        names = {key: block.name for key, block in self.blocks.items()}
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.blocks[key].buf)
+                       for key, (shape, dtype) in layout.items()}
+
+        ctx = mp.get_context(context)
+        self.pipes, self.processes = [], []
+        bounds = np.linspace(0, num_envs, self.num_workers+1).astype(int)
+        for w in range(self.num_workers):
+            start, end = int(bounds[w]), int(bounds[w+1])
+            env_kwargs = dict(bin_height=bin_height, bin_width=bin_width, num_items=num_items,
+                              bin_height_virtual=H, bin_width_virtual=W,
+                              seeds=self.seeds[start:end], obs_mode=obs_mode)
+            parent_pipe, child_pipe = ctx.Pipe()
+            p = ctx.Process(target=worker, args=(child_pipe, parent_pipe, layout, names, start, end, env_kwargs),
+                            daemon=True)
+            p.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(p)
+        self.waiting = False
+        self.broken = False
+        self.closed = False
+
+    def get_obs(self, prefix='obs'):
+        if self.obs_mode == 'dense':
+            return self.arrays[prefix]
+        return {'bin': self.arrays[prefix+'_bin'], 'items': self.arrays[prefix+'_items']}
+
+    def send(self, cmd):
+        for pipe in self.pipes:
+            pipe.send(cmd)
+
+    def wait(self):
+        # collect the replies of all workers; a worker that raised has exited, so the env is
+        # broken after the first error (only close() is allowed then)
+        errors = []
+        for pipe in self.pipes:
+            try:
+                errors.append(pipe.recv())
+            except (EOFError, OSError) as e:
+                errors.append(ConnectionError('worker exited: {!r}'.format(e)))
+        for e in errors:
+            if e is not None:
+                self.broken = True
+                raise e
+
+    def check(self):
+        if self.closed:
+            raise RuntimeError('BppSubprocEnv is closed')
+        if self.broken:
+            raise RuntimeError('BppSubprocEnv is broken after a worker error, close it')
+        assert not self.waiting
+
+    def reset(self):
+        self.check()
+        self.send('reset')
+        self.wait()
+        return self.get_obs()
+
+    def step_async(self, actions):
+        # start a step; the result is collected by step_wait
+        self.check()
+        self.arrays['actions'][:] = actions
+        self.send('step')
+        self.waiting = True
+
+    def step_wait(self):
+        assert self.waiting
+        try:
+            self.wait()
+        finally:
+            self.waiting = False
+        info = {'action_mask': self.arrays['action_mask'],
+                'final_observation': self.get_obs('final_obs')}
+        return self.get_obs(), self.arrays['rewards'], self.arrays['dones'], info
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        # stop the workers (dead ones are skipped) and always unlink the shared memory
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.waiting and not self.broken:
+                try:
+                    self.wait()
+                except Exception:
+                    pass
+                self.waiting = False
+            for pipe, p in zip(self.pipes, self.processes):
+                if p.is_alive():
+                    try:
+                        pipe.send('close')
+                    except (BrokenPipeError, OSError):
+                        pass
+            for pipe, p in zip(self.pipes, self.processes):
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+                pipe.close()
+        finally:
+            self.arrays = {}
+            for block in self.blocks.values():
+                try:
+                    block.close()
+                except BufferError:
+                    # views returned to the caller are still alive
+                    pass
+                block.unlink()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
@@ -0,0 +1,98 @@
+import numpy as np
+from gym import spaces
+
+from .BinPackingGame import BinPackingGame as Game
+from .BinPackingGame import ItemsGenerator as Generator
+from .bpp_env import get_seed
+
+class BppVectorEnv():
+    """K bin packing environments stepped together with batched NumPy operations.
+
+    Sub-environment k behaves like BppEnv(..., seed=seeds[k]): bins are held as one
+    K * H * W array and items as one K * N * (w, h, placed) array. Sub-environments
+    that finish are reset automatically; their last observation is in
+    info['final_observation'].
+    """
+
+    def __init__(self, num_envs, bin_height=10, bin_width=10, num_items=10, bin_height_virtual=15, bin_width_virtual=15,
+                 seeds=None, obs_mode='dense', auto_reset=True):
+        self.num_envs = num_envs
+        self.bin_height, self.bin_width = bin_height, bin_width
+        self.num_items = num_items
+        self.bin_height_virtual, self.bin_width_virtual = bin_height_virtual, bin_width_virtual
+        # one seed per sub-environment, as the seed of BppEnv; default: 0, 1, ..., K-1
+        if seeds is None:
+            seeds = list(range(num_envs))
+        assert len(seeds) == num_envs
+        self.seeds = [get_seed(seed) for seed in seeds]
+        assert obs_mode in ('dense', 'compact')
+        self.obs_mode = obs_mode
+        self.auto_reset = auto_reset
+        self.max_step = 100
+
+        self.gen = Generator(bin_width, bin_height, num_items)
+        self.game = Game(bin_width_virtual, bin_height_virtual, num_items, n=1)
+        # items of each sub-environment; every reset starts again from these
+        self.init_items = np.stack([self.game.getInitItems(self.gen.items_generator(seed)) for seed in self.seeds])
+        self.items_total_area = (self.init_items[:, :, 0] * self.init_items[:, :, 1]).sum(axis=1)
+
+        self.boards = np.zeros((num_envs, bin_height_virtual, bin_width_virtual), dtype=int)
+        self.items = self.init_items.copy()
+        self.steps = np.zeros(num_envs, dtype=int)
+        # valid moves of the current states, K * action size
+        self.valids = self.game.getValidMovesBatch(self.boards, self.items)
+
+        self.single_action_space = spaces.Discrete(self.game.getActionSize())
+        self.action_space = spaces.MultiDiscrete([self.game.getActionSize()]*num_envs)
+
+    def get_obs(self, idx=slice(None)):
+        # observations of the sub-environments idx, stacked
+        if self.obs_mode == 'dense':
+            return self.game.getBinItemBatch(self.boards[idx], self.items[idx])
+        return {'bin': self.boards[idx].copy(), 'items': self.items[idx].copy()}
+
+    def reset_envs(self, idx):
+        # reset the sub-environments idx (an index array)
+        self.boards[idx] = 0
+        self.items[idx] = self.init_items[idx]
+        self.steps[idx] = 0
+        self.valids[idx] = self.game.getValidMovesBatch(self.boards[idx], self.items[idx])
+
+    def reset(self):
+        self.reset_envs(np.arange(self.num_envs))
+        return self.get_obs()
+
+    def step(self, actions):
+        # actions: K flat actions, as the action of BppEnv
+        actions = np.asarray(actions, dtype=int)
+        k = np.arange(self.num_envs)
+        self.steps += 1
+        exceed_max_step = self.steps > self.max_step
+
+        # invalid actions leave their sub-environment unchanged
+        valid = self.valids[k, actions]
+        idx = np.flatnonzero(valid)
+        boards, items = self.game.getNextStateBatch(self.boards[idx], actions[idx], self.items[idx])
+        self.boards[idx] = boards
+        self.items[idx] = items
+        valids = self.game.getValidMovesBatch(boards, items)
+        self.valids[idx] = valids
+
+        ended = np.zeros(self.num_envs, dtype=bool)
+        ended[idx] = ~valids.any(axis=1)
+        rewards = np.zeros(self.num_envs)
+        end_idx = np.flatnonzero(ended)
+        rewards[end_idx] = self.game.getRewardBatch(self.boards[end_idx], self.items_total_area[end_idx])
+        dones = ended | exceed_max_step
+
+        obs = self.get_obs()
+        info = {}
+        if self.auto_reset and dones.any():
+            info['final_observation'] = obs
+            self.reset_envs(np.flatnonzero(dones))
+            obs = self.get_obs()
+        info['action_mask'] = self.valids.copy()
+        return obs, rewards, dones, info
+
+    def close(self):
+        pass